@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import os
+import random
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+# Configuration
+AI_BACKEND = os.environ.get("AI_BACKEND", "openai")  # "openai", "local" or "fake"
+AI_MODEL = os.environ.get("AI_MODEL", "gpt-4o-mini")
+AI_BASE_URL = os.environ.get("AI_BASE_URL", "http://localhost:11434/v1")  # For "local"
+AI_FAKE_LATENCY = float(os.environ.get("AI_FAKE_LATENCY", "0.3"))  # Seconds before the first token
+AI_FAKE_TOKENS_PER_SECOND = float(os.environ.get("AI_FAKE_TOKENS_PER_SECOND", "40"))
+AI_FAKE_REPLY_TOKENS = int(os.environ.get("AI_FAKE_REPLY_TOKENS", "30"))
+
+_FAKE_WORDS = (
+    "shark", "loot", "boss", "chat", "map", "build", "crit", "mana", "flask",
+    "portal", "league", "drop", "rng", "gg", "exile", "grind", "sassy", "joke",
+)
+
+
+class OpenAIBackend:
+    """OpenAI, or any server that speaks the OpenAI chat completions API.
+
+    The client is created on first use, so importing the bot (or running
+    it with another backend) never needs an API key.
+    """
+
+    def __init__(self, model: str = AI_MODEL, base_url: str | None = None, api_key: str | None = None):
+        self.model = model
+        self._base_url = base_url
+        self._api_key = api_key
+        self._client = None
+
+    @property
+    def name(self) -> str:
+        return "local" if self._base_url else "openai"
+
+    async def create(self, **kwargs):
+        """Same as client.chat.completions.create()."""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self._api_key or os.environ.get("OPENAI_API_KEY") or "none",
+                base_url=self._base_url,
+            )
+        return await self._client.chat.completions.create(**kwargs)
+
+
+class _FakeStream:
+    """Async iterator of completion chunks, paced like a real stream."""
+
+    def __init__(self, words: list[str], prompt_tokens: int, latency: float, tokens_per_second: float):
+        self._words = words
+        self._prompt_tokens = prompt_tokens
+        self._latency = latency
+        self._interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self._index = 0
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        if self._index == len(self._words):
+            self._finished = True
+            usage = SimpleNamespace(prompt_tokens=self._prompt_tokens, completion_tokens=len(self._words))
+            return SimpleNamespace(choices=[], usage=usage)
+        await asyncio.sleep(self._latency if self._index == 0 else self._interval)
+        word = self._words[self._index]
+        self._index += 1
+        delta = SimpleNamespace(content=word if self._index == 1 else " " + word)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    async def close(self) -> None:
+        self._finished = True
+
+
+class FakeBackend:
+    """Deterministic offline backend for benchmarks and soak tests.
+
+    Replies are derived from the last message, so the same prompt always
+    gets the same answer. Time to first token is `latency` and the rest of
+    the reply arrives at `tokens_per_second` (one word = one token).
+    Placeholders such as {user} in the prompt are echoed back, so canned
+    reply templates come out valid.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        model: str = "fake",
+        latency: float = AI_FAKE_LATENCY,
+        tokens_per_second: float = AI_FAKE_TOKENS_PER_SECOND,
+        reply_tokens: int = AI_FAKE_REPLY_TOKENS,
+    ):
+        self.model = model
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+
+    async def create(self, messages: list[dict], stream: bool = False, **kwargs):
+        words = self._reply_words(messages)
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        reply = _FakeStream(words, prompt_tokens, self.latency, self.tokens_per_second)
+        if stream:
+            return reply
+
+        parts = []
+        async for chunk in reply:
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content)
+            else:
+                usage = chunk.usage
+        message = SimpleNamespace(role="assistant", content="".join(parts))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _reply_words(self, messages: list[dict]) -> list[str]:
+        last = messages[-1].get("content") or "" if messages else ""
+        rng = random.Random(hashlib.sha256(last.encode()).digest())
+        words = [rng.choice(_FAKE_WORDS) for _ in range(max(1, self.reply_tokens))]
+        # End a sentence every eight words so streamed replies get split
+        for i in range(7, len(words), 8):
+            words[i] += "."
+        if not words[-1].endswith("."):
+            words[-1] += "."
+        words[:0] = [p for p in ("{user}", "{count}") if p in last]
+        return words
+
+
+def create_backend(kind: str = AI_BACKEND):
+    """The backend selected by AI_BACKEND."""
+    if kind == "fake":
+        return FakeBackend()
+    if kind == "local":
+        return OpenAIBackend(base_url=AI_BASE_URL, api_key=os.environ.get("AI_API_KEY"))
+    if kind == "openai":
+        return OpenAIBackend()
+    raise ValueError(f"Unknown AI_BACKEND: {kind!r} (expected openai, local or fake)")
@@ -0,0 +1,145 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a response stays valid, per prompt kind. Kinds not listed
+# (e.g. mentions, which depend on the live conversation) are never cached.
+CACHE_TTLS = {
+    "search": 600.0,
+    "lurk": 300.0,
+    "raid": 120.0,
+    "follow": 120.0,
+    "sub": 120.0,
+    "gift": 120.0,
+}
+MAX_CACHE_ENTRIES = 512
+MAX_CACHE_BYTES = 1_000_000
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case, punctuation and spacing so near-identical prompts share a key."""
+    text = _PUNCTUATION.sub(" ", prompt.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """TTL + LRU cache of AI responses keyed on (kind, normalized prompt).
+
+    Entries expire per kind, the least recently used ones are evicted once
+    the entry or byte budget is exceeded, and concurrent requests for the
+    same key share a single completion.
+    """
+
+    def __init__(
+        self,
+        ttls: dict[str, float] = CACHE_TTLS,
+        max_entries: int = MAX_CACHE_ENTRIES,
+        max_bytes: int = MAX_CACHE_BYTES,
+    ):
+        self._ttls = dict(ttls)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, response, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._counters = {}  # kind -> {"hits": n, "misses": n, "coalesced": n}
+        self._evictions = 0
+
+    def cacheable(self, kind: str) -> bool:
+        return kind in self._ttls
+
+    def get(self, kind: str, prompt: str) -> str | None:
+        response = self._lookup((kind, normalize_prompt(prompt)))
+        self._count(kind, "hits" if response is not None else "misses")
+        return response
+
+    def put(self, kind: str, prompt: str, response: str) -> None:
+        if not self.cacheable(kind):
+            return
+        key = (kind, normalize_prompt(prompt))
+        size = len(key[1].encode()) + len(response.encode())
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self._ttls[kind], response, size)
+            self._bytes += size
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    async def get_or_compute(self, kind: str, prompt: str, compute) -> str:
+        """Return a cached response, or await compute() once per key and cache it.
+
+        Responses starting with "Error:" (or None) are returned but not cached.
+        """
+        if not self.cacheable(kind):
+            return await compute()
+
+        key = (kind, normalize_prompt(prompt))
+        cached = self._lookup(key)
+        if cached is not None:
+            self._count(kind, "hits")
+            return cached
+
+        pending = self._in_flight.get(key)
+        if pending:
+            # Someone is already asking the same thing; share their answer
+            self._count(kind, "coalesced")
+            return await asyncio.shield(pending)
+
+        self._count(kind, "misses")
+        future = asyncio.ensure_future(compute())
+        self._in_flight[key] = future
+        try:
+            response = await asyncio.shield(future)
+        finally:
+            self._in_flight.pop(key, None)
+        if response and not response.startswith("Error:"):
+            self.put(kind, prompt, response)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_kind = {}
+            for kind, counters in sorted(self._counters.items()):
+                served = counters["hits"] + counters["coalesced"]
+                total = served + counters["misses"]
+                per_kind[kind] = dict(counters, hit_rate=served / total if total else 0.0)
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self._evictions,
+                "kinds": per_kind,
+            }
+
+    def _lookup(self, key) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            if entry:
+                self._remove(key)
+            return None
+
+    def _count(self, kind: str, outcome: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                kind, {"hits": 0, "misses": 0, "coalesced": 0}
+            )
+            counters[outcome] += 1
+
+    def _remove(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+response_cache = ResponseCache()
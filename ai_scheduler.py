@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+LOGGER = logging.getLogger("AIScheduler")
+
+# Configuration
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+
+
+@dataclass(frozen=True)
+class PriorityClass:
+    priority: int  # Lower runs first
+    max_concurrency: int  # Requests of this class in flight at once
+    deadline: float  # Seconds a request may wait in the queue before it is dropped
+
+
+PRIORITY_CLASSES = {
+    "mention": PriorityClass(0, 4, 15.0),
+    "event": PriorityClass(1, 2, 30.0),
+    "lurk": PriorityClass(2, 1, 20.0),
+    "search": PriorityClass(3, 1, 60.0),
+    "background": PriorityClass(4, 1, 5.0),  # Canned reply generation and anything unknown
+}
+
+# Request kind (as used by SharkAI and telemetry) -> priority class
+KIND_CLASSES = {
+    "mention": "mention",
+    "raid": "event",
+    "follow": "event",
+    "sub": "event",
+    "gift": "event",
+    "events": "event",
+    "lurk": "lurk",
+    "search": "search",
+}
+
+
+class RequestExpired(Exception):
+    """An AI request waited past its deadline and was dropped unstarted."""
+
+
+class AIScheduler:
+    """Hands out AI request slots by priority instead of arrival order.
+
+    At most `max_concurrency` requests run at once and each class has its
+    own cap, so lurk jokes and thank-yous can never take every slot away
+    from mentions. When a slot frees up, the highest-priority waiter whose
+    class is under its cap gets it. A request still queued at its deadline
+    raises RequestExpired: a late answer is no use in live chat.
+    """
+
+    def __init__(self, max_concurrency: int = AI_MAX_CONCURRENCY, classes: dict[str, PriorityClass] = PRIORITY_CLASSES):
+        self._max_concurrency = max_concurrency
+        self._classes = dict(classes)
+        self._running = {name: 0 for name in self._classes}
+        self._waiters = []  # [priority, sequence, class name, future], kept sorted
+        self._sequence = itertools.count()
+        self._counters = {name: {"started": 0, "expired": 0, "max_wait": 0.0} for name in self._classes}
+
+    def class_for(self, kind: str) -> str:
+        return KIND_CLASSES.get(kind, "background")
+
+    @asynccontextmanager
+    async def slot(self, kind: str, deadline: float | None = None):
+        """Hold a slot for a `kind` request; raises RequestExpired if none
+        frees up within `deadline` seconds (the class default if None)."""
+        name = self.class_for(kind)
+        await self._acquire(name, self._classes[name].deadline if deadline is None else deadline)
+        try:
+            yield
+        finally:
+            self._release(name)
+
+    def stats(self) -> dict:
+        queued = {name: 0 for name in self._classes}
+        for _, _, name, _ in self._waiters:
+            queued[name] += 1
+        return {
+            "max_concurrency": self._max_concurrency,
+            "classes": {
+                name: dict(self._counters[name], queued=queued[name], running=self._running[name])
+                for name in self._classes
+            },
+        }
+
+    async def _acquire(self, name: str, deadline: float) -> None:
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        waiter = [self._classes[name].priority, next(self._sequence), name, future]
+        self._waiters.append(waiter)
+        self._waiters.sort()
+        self._wake()
+        try:
+            await asyncio.wait_for(future, deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif future.done() and not future.cancelled():
+                self._release(name)  # Granted just as we gave up
+            if isinstance(e, asyncio.TimeoutError):
+                self._counters[name]["expired"] += 1
+                LOGGER.warning(f"Dropped {name} AI request after waiting {deadline:g}s")
+                raise RequestExpired(f"{name} request waited longer than {deadline:g}s") from None
+            raise
+        counters = self._counters[name]
+        counters["started"] += 1
+        counters["max_wait"] = max(counters["max_wait"], time.monotonic() - started)
+
+    def _release(self, name: str) -> None:
+        self._running[name] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in list(self._waiters):
+            if sum(self._running.values()) >= self._max_concurrency:
+                return
+            _, _, name, future = waiter
+            if self._running[name] >= self._classes[name].max_concurrency:
+                continue  # Class is at its cap; lower priorities may still run
+            self._waiters.remove(waiter)
+            if future.done():
+                continue
+            self._running[name] += 1
+            future.set_result(None)
@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+from collections import deque
+
+from metrics import percentile
+
+# Constants
+TELEMETRY_WINDOW = 3600.0  # Seconds of calls kept for the rolling statistics
+MAX_TELEMETRY_RECORDS = 5000
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, math.inf)  # Upper bounds, seconds
+# USD per million tokens: (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def _histogram(values: list[float]) -> dict:
+    counts = {}
+    for bound in LATENCY_BUCKETS:
+        label = "+inf" if math.isinf(bound) else f"{bound:g}"
+        counts[label] = sum(1 for value in values if value <= bound)  # Cumulative
+    return counts
+
+
+class AITelemetry:
+    """Records every AI call and aggregates the recent ones per kind.
+
+    Each record holds the call kind (mention, raid, follow, sub, gift, lurk,
+    search), token usage, how much of the prompt was chat transcript,
+    wall-clock latency (and time to first token for streams), and any error.
+    """
+
+    def __init__(self, window: float = TELEMETRY_WINDOW, max_records: int = MAX_TELEMETRY_RECORDS):
+        self._window = window
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        context_tokens: int = 0,
+        first_token_latency: float | None = None,
+        error: str | None = None,
+    ) -> None:
+        with self._lock:
+            self._records.append(
+                {
+                    "time": time.time(),
+                    "kind": kind,
+                    "model": model,
+                    "latency": latency,
+                    "first_token_latency": first_token_latency,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "context_tokens": context_tokens,
+                    "error": error,
+                }
+            )
+
+    def snapshot(self) -> dict:
+        """Per-kind aggregates over the rolling window."""
+        cutoff = time.time() - self._window
+        with self._lock:
+            records = [r for r in self._records if r["time"] >= cutoff]
+
+        kinds = {}
+        for kind in sorted({r["kind"] for r in records}):
+            kinds[kind] = self._aggregate([r for r in records if r["kind"] == kind])
+        return {
+            "window_seconds": self._window,
+            "uptime_seconds": time.time() - self._started,
+            "total": self._aggregate(records),
+            "kinds": kinds,
+        }
+
+    @staticmethod
+    def _aggregate(records: list[dict]) -> dict:
+        latencies = sorted(r["latency"] for r in records if not r["error"])
+        first_tokens = sorted(
+            r["first_token_latency"] for r in records if r["first_token_latency"] is not None
+        )
+        prompt_tokens = sum(r["prompt_tokens"] for r in records)
+        completion_tokens = sum(r["completion_tokens"] for r in records)
+        cost = 0.0
+        for r in records:
+            prompt_price, completion_price = MODEL_PRICES.get(r["model"], (0.0, 0.0))
+            cost += (r["prompt_tokens"] * prompt_price + r["completion_tokens"] * completion_price) / 1_000_000
+        errors = {}
+        for r in records:
+            if r["error"]:
+                errors[r["error"]] = errors.get(r["error"], 0) + 1
+        return {
+            "calls": len(records),
+            "errors": sum(errors.values()),
+            "error_types": errors,
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "latency_histogram": _histogram(latencies),
+            "first_token_p50": percentile(first_tokens, 0.50),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "context_tokens": sum(r["context_tokens"] for r in records),
+            "avg_prompt_tokens": prompt_tokens / len(records) if records else 0.0,
+            "cost_usd": round(cost, 6),
+        }
+
+
+telemetry = AITelemetry()
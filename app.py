@@ -1,15 +1,27 @@
 import asyncio
 import threading
-import sqlite3
 import logging
 
 from sharkbot import start_bot
+from sharkai import engine as ai_engine
+from ai_cache import response_cache
+from ai_telemetry import telemetry
+from canned_responses import canned_responses
+from chat_store import chat_store
+from database import db
+from db_migrations import migrate
+from pubsub import format_sse, sse_stream
+from tts_cache import tts_cache
+from tts_jobs import tts_jobs
+from tts_pipeline import tts_pipeline
+from tts_stream import playback, tts_events, utterances
+from youtube_relay import youtube_relay
 import time
 import os
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 
 load_dotenv()
@@ -21,6 +33,8 @@ LOGGER = logging.getLogger("App")
 app = Flask(__name__)
 CORS(app)
 SQL_DB_PATH = os.environ.get("SQL_CONNECT", "messages.db")
+# Distinguishes chat ETags issued by different server runs
+CHAT_ETAG_EPOCH = int(time.time())
 
 
 def run_bot():
@@ -78,6 +92,12 @@ def chat_overlay():
     return send_from_directory('.', 'chat_overlay.html')
 
 
+@app.route('/tts_overlay.html')
+def tts_overlay():
+    """Serve the TTS overlay HTML."""
+    return send_from_directory('.', 'tts_overlay.html')
+
+
 @app.route('/links')
 def links_manager():
     """Serve the links manager HTML."""
@@ -92,70 +112,98 @@ def tts_page():
 
 @app.route('/api/chat')
 def get_chat_messages():
-    """Get recent chat messages for the overlay."""
+    """Get recent chat messages for the overlay.
+
+    Pass ?since=<id> to only receive messages newer than that id. Responses
+    carry an ETag, so a poll with a matching If-None-Match gets a bare 304.
+    """
     try:
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        
-        # Ensure messages table exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_user TEXT NOT NULL,
-                message TEXT NOT NULL,
-                platform TEXT DEFAULT 'twitch',
-                timestamp REAL DEFAULT (julianday('now'))
-            )
-        ''')
-        
-        # Get recent messages (last 50, ordered by most recent)
-        cursor.execute('''
-            SELECT from_user, message, platform, timestamp
-            FROM messages
-            ORDER BY timestamp DESC
-            LIMIT 50
-        ''')
-        
-        rows = cursor.fetchall()
-        messages = []
-        for row in rows:
-            messages.append({
-                'user': row[0],
-                'message': row[1],
-                'platform': row[2] if row[2] else 'twitch',
-                'timestamp': row[3] if row[3] else None
-            })
-        
-        conn.close()
+        since = request.args.get('since', type=int)
+        version, last_id, rows = chat_store.snapshot(since, limit=50)
+
+        # The client's cursor always comes from the response carrying its
+        # ETag, so an unchanged store version means nothing new for it
+        etag = f"chat-{CHAT_ETAG_EPOCH}-{version}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        # Served from the bot's in-memory ring buffer (oldest first)
+        messages = [
+            {
+                'id': msg['id'],
+                'user': msg['user'],
+                'message': msg['message'],
+                'platform': msg['platform'] or 'twitch',
+                'timestamp': msg['timestamp']
+            }
+            for msg in rows
+        ]
         
-        # Reverse to show oldest first (for overlay display)
-        messages.reverse()
-        
-        return jsonify({'messages': messages})
+        response = jsonify({'messages': messages, 'cursor': last_id})
+        response.set_etag(etag)
+        return response
     except Exception as e:
         LOGGER.error(f"Error fetching chat messages: {e}")
         return jsonify({'error': str(e), 'messages': []}), 500
 
 
+@app.route('/api/chat/stream')
+def stream_chat_messages():
+    """Push chat changes to the overlay as Server-Sent Events.
+
+    Events: "chat" (a new message), "delete" (ids purged by a ban) and
+    "clear". On reconnect the browser sends Last-Event-ID, and anything
+    newer than it is replayed first.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('since', type=int)
+
+    # Subscribe before taking the backlog so nothing falls in between;
+    # the overlay dedupes on message id
+    subscription = chat_store.events.subscribe()
+    _, _, backlog = chat_store.snapshot(last_event_id, limit=50)
+
+    def generate():
+        for msg in backlog:
+            yield format_sse('chat', msg, msg['id'])
+        yield from sse_stream(chat_store.events, subscription)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/ai/cache')
+def get_ai_cache_stats():
+    """AI response cache hit/miss counters, for tuning TTLs."""
+    return jsonify(response_cache.stats())
+
+
+@app.route('/api/ai/stats')
+def get_ai_stats():
+    """Rolling AI call telemetry: latency histograms, tokens and cost per kind,
+    plus the scheduler's queue depth and dropped requests per priority class."""
+    return jsonify(dict(telemetry.snapshot(), scheduler=ai_engine.scheduler.stats()))
+
+
+@app.route('/api/ai/canned')
+def get_canned_stats():
+    """Canned event reply pool: lines ready per kind and how often it was empty."""
+    return jsonify(canned_responses.stats())
+
+
 @app.route('/api/links', methods=['GET'])
 def get_links():
     """Get all links from database."""
     try:
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        
-        # Ensure links table exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS links (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        ''')
-        
-        cursor.execute("SELECT key, value FROM links")
-        rows = cursor.fetchall()
+        with db.connection() as conn:
+            rows = conn.execute("SELECT key, value FROM links").fetchall()
         links = {row[0]: row[1] for row in rows}
-        conn.close()
         
         return jsonify(links)
     except Exception as e:
@@ -168,25 +216,11 @@ def save_links():
     """Save links to database."""
     try:
         data = request.json
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        
-        # Ensure links table exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS links (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        ''')
-        
-        for key, value in data.items():
-            cursor.execute('''
+        with db.transaction() as conn:
+            conn.executemany('''
                 INSERT OR REPLACE INTO links (key, value)
                 VALUES (?, ?)
-            ''', (key, value))
-        
-        conn.commit()
-        conn.close()
+            ''', list(data.items()))
         
         return jsonify({'success': True})
     except Exception as e:
@@ -196,126 +230,136 @@ def save_links():
 
 @app.route('/api/tts')
 def get_tts_info():
-    """Get TTS file info (timestamp to detect new files)."""
-    import os
-    
-    TTS_FILE = 'tts.mp3'
-    
-    try:
-        if os.path.exists(TTS_FILE):
-            # Get file modification time
-            mtime = os.path.getmtime(TTS_FILE)
-            file_size = os.path.getsize(TTS_FILE)
-            
-            return jsonify({
-                'exists': True,
-                'timestamp': mtime,
-                'size': file_size,
-                'url': '/api/tts/audio'
-            })
-        else:
-            return jsonify({
-                'exists': False,
-                'timestamp': None,
-                'size': 0,
-                'url': None
-            })
-    except Exception as e:
-        LOGGER.error(f"Error getting TTS info: {e}")
-        return jsonify({'error': str(e), 'exists': False}), 500
-
-
-@app.route('/api/tts/audio')
-def serve_tts_audio():
-    """Serve the TTS audio file."""
-    from flask import send_file
-    import os
-    
-    TTS_FILE = 'tts.mp3'
-    
-    if os.path.exists(TTS_FILE):
-        return send_file(TTS_FILE, mimetype='audio/mpeg')
-    else:
-        return jsonify({'error': 'TTS file not found'}), 404
+    """The clip the overlay should be playing now (for overlays that poll)."""
+    current = playback.current()
+    if current is None:
+        return jsonify({'exists': False, 'utterance_id': None, 'url': None, 'pending': playback.pending()})
+    return jsonify({
+        'exists': True,
+        'utterance_id': current.id,
+        'url': current.url,
+        'pending': playback.pending()
+    })
+
+
+@app.route('/api/tts/ack/<utterance_id>', methods=['POST'])
+def ack_tts(utterance_id):
+    """The overlay finished playing a clip; start the next one."""
+    return jsonify({'advanced': playback.ack(utterance_id)})
+
+
+@app.route('/api/tts/stream/<utterance_id>')
+def stream_tts_audio(utterance_id):
+    """Stream an utterance's audio while it is still being synthesized."""
+    stream = utterances.get(utterance_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown utterance'}), 404
+
+    if stream.done:
+        if stream.error:
+            return jsonify({'error': str(stream.error)}), 500
+        # Each utterance id is only ever used for one clip
+        return Response(
+            stream.data(),
+            mimetype=stream.mimetype,
+            headers={'Cache-Control': 'public, max-age=86400, immutable'}
+        )
+
+    # No Content-Length, so the response goes out chunked as audio arrives
+    return Response(
+        stream.iter_chunks(),
+        mimetype=stream.mimetype,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        direct_passthrough=True
+    )
+
+
+@app.route('/api/tts/cache')
+def get_tts_cache_stats():
+    """TTS audio cache hit rate and disk usage."""
+    return jsonify(tts_cache.stats())
+
+
+@app.route('/api/youtube/relay')
+def get_youtube_relay_stats():
+    """Twitch-to-YouTube relay backlog, messages sent and quota used."""
+    return jsonify(youtube_relay.stats())
+
+
+@app.route('/api/tts/queue')
+def get_tts_queue_stats():
+    """TTS queue depth, wait times, and jobs dropped, expired or merged."""
+    return jsonify(tts_jobs.stats())
+
+
+@app.route('/api/tts/health')
+def get_tts_health():
+    """TTS backend circuit breaker state and fallback usage."""
+    return jsonify(tts_pipeline.stats())
+
+
+@app.route('/api/tts/events')
+def stream_tts_events():
+    """Notify the TTS overlay (via SSE) as soon as a new utterance starts."""
+    subscription = tts_events.subscribe()
+    return Response(
+        sse_stream(tts_events, subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _friendly_tts_error(error_msg):
+    """A more helpful message for common TTS service errors."""
+    if '403' in error_msg or 'Invalid response status' in error_msg:
+        return "TTS service temporarily unavailable (403 error). This may be due to rate limiting or API changes. Please try again in a few moments."
+    if '401' in error_msg or 'Unauthorized' in error_msg:
+        return "TTS authentication failed. The service may have changed its requirements."
+    if 'timeout' in error_msg.lower():
+        return "TTS request timed out. Please try again."
+    return error_msg
 
 
 @app.route('/api/tts/generate', methods=['POST'])
 def generate_tts():
-    """Generate TTS from text input."""
-    from gtts import gTTS
+    """Queue TTS for the given text; returns a job id right away.
+
+    The job goes through the bot's own TTS queue, so it plays in OBS after
+    whatever the bot is already saying. Poll /api/tts/jobs/<id>, or listen
+    for "job" events on /api/tts/events, to see when it is ready.
+    """
+    data = request.json
+    if not data or 'text' not in data:
+        return jsonify({'error': 'Text is required'}), 400
     
-    TTS_FILE = 'tts.mp3'
-    bot_language = "en-au"  # Australian English (gTTS format)
+    text = data['text'].strip()
+    if not text:
+        return jsonify({'error': 'Text cannot be empty'}), 400
     
     try:
-        data = request.json
-        if not data or 'text' not in data:
-            return jsonify({'error': 'Text is required'}), 400
-        
-        text = data['text'].strip()
-        if not text:
-            return jsonify({'error': 'Text cannot be empty'}), 400
-        
-        # Delete old file first
-        if os.path.exists(TTS_FILE):
-            try:
-                os.remove(TTS_FILE)
-            except Exception:
-                pass
-        
-        # Generate and save TTS with retry logic
-        max_retries = 3
-        retry_delay = 2
-        for attempt in range(max_retries):
-            try:
-                # Add a small delay between retries to avoid rate limiting
-                if attempt > 0:
-                    import time
-                    time.sleep(retry_delay * attempt)
-                
-                # Generate TTS using gTTS (synchronous)
-                tts = gTTS(text=text, lang=bot_language, slow=False)
-                tts.save(TTS_FILE)
-                break  # Success, exit retry loop
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    # Last attempt failed, raise the error
-                    raise Exception(f"TTS generation failed after {max_retries} attempts: {str(e)}")
-                else:
-                    LOGGER.warning(f"TTS generation attempt {attempt + 1} failed: {e}, retrying...")
-                    import time
-                    time.sleep(retry_delay)
-        
-        # Wait a bit to ensure file is fully written and flushed to disk
-        import time
-        time.sleep(0.2)
-        
-        # Verify file was created and has content
-        if os.path.exists(TTS_FILE) and os.path.getsize(TTS_FILE) > 0:
-            # Get the file modification time for the response
-            mtime = os.path.getmtime(TTS_FILE)
-            return jsonify({
-                'success': True,
-                'url': '/api/tts/audio',
-                'message': 'TTS generated successfully and will play in OBS',
-                'timestamp': mtime
-            })
-        else:
-            return jsonify({'error': 'Failed to generate TTS file'}), 500
-            
-    except Exception as e:
-        error_msg = str(e)
-        LOGGER.error(f"Error generating TTS: {e}")
-        
-        # Provide more helpful error messages
-        if '403' in error_msg or 'Invalid response status' in error_msg:
-            error_msg = "TTS service temporarily unavailable (403 error). This may be due to rate limiting or API changes. Please try again in a few moments."
-        elif '401' in error_msg or 'Unauthorized' in error_msg:
-            error_msg = "TTS authentication failed. The service may have changed its requirements."
-        elif 'timeout' in error_msg.lower():
-            error_msg = "TTS request timed out. Please try again."
-        
-        return jsonify({'error': error_msg}), 500
+        # Someone is waiting on the page for this one; don't expire it
+        job = tts_jobs.submit(text, source='manual', max_age=None)
+    except RuntimeError as e:
+        LOGGER.error(f"Error queueing TTS: {e}")
+        return jsonify({'error': 'TTS is not available until the bot has started'}), 503
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status_url': f"/api/tts/jobs/{job['id']}",
+        'queued_ahead': max(0, tts_jobs.pending() - 1),
+        'message': 'TTS queued and will play in OBS'
+    }), 202
+
+
+@app.route('/api/tts/jobs/<job_id>')
+def get_tts_job(job_id):
+    """Status of a TTS job: queued, synthesizing, done, failed or dropped."""
+    job = tts_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown TTS job'}), 404
+    if job['error']:
+        job['error'] = _friendly_tts_error(job['error'])
+    return jsonify(job)
 
 
 def run_flask_server():
@@ -328,38 +372,18 @@ def run_flask_server():
 
 
 if __name__ == "__main__":
+    # Create/upgrade the schema once at startup
+    migrate(db)
+
     # Clear messages database on startup
     try:
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        # Ensure messages table exists first
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_user TEXT NOT NULL,
-                message TEXT NOT NULL,
-                platform TEXT DEFAULT 'twitch',
-                timestamp REAL DEFAULT (julianday('now'))
-            )
-        ''')
-        # Clear all messages
-        cursor.execute("DELETE FROM messages;")
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db.transaction() as conn:
+            # Clear all messages
+            conn.execute("DELETE FROM messages;")
         LOGGER.info(f"Cleared messages database at {SQL_DB_PATH}")
     except Exception as e:
         LOGGER.warning(f"Could not clear messages database: {e}")
     
-    # Clear old TTS file on startup to prevent playing old audio on overlay refresh
-    TTS_FILE = 'tts.mp3'
-    try:
-        if os.path.exists(TTS_FILE):
-            os.remove(TTS_FILE)
-            LOGGER.info("Cleared old TTS file on startup")
-    except Exception as e:
-        LOGGER.warning(f"Could not clear TTS file: {e}")
-    
     # Start bot in background thread
     LOGGER.info("Starting bot...")
     bot_thread = threading.Thread(target=run_bot, daemon=True)
@@ -0,0 +1,88 @@
+"""Benchmark the AI path offline with the fake backend.
+
+Fires bursts of concurrent mentions (streamed, like `sharko ...` in chat)
+and event thank-yous (through the response cache) at SharkAI, backed by
+ai_backends.FakeBackend instead of a real model, and reports latency to
+the first sentence and to the full reply.
+
+    python bench_ai.py [--mentions 40] [--events 40] [--latency 0.3] [--tokens-per-second 40]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sharkai
+from ai_backends import FakeBackend
+from ai_telemetry import AITelemetry
+from sharkai import AIEngine, SharkAI
+
+
+def _summary(latencies: list[float]) -> str:
+    if not latencies:
+        return "no samples"
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return f"p50 {statistics.median(latencies) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms"
+
+
+async def mention(index: int, first_sentences: list[float], replies: list[float]) -> None:
+    started = time.perf_counter()
+    first = None
+    async for _ in SharkAI.stream_chat_with_openai(
+        f"new message from viewer{index}: what build should I play {index}, response",
+        user=f"viewer{index}",
+    ):
+        if first is None:
+            first = time.perf_counter() - started
+            first_sentences.append(first)
+    replies.append(time.perf_counter() - started)
+
+
+async def event(index: int, distinct: int, replies: list[float]) -> None:
+    started = time.perf_counter()
+    await SharkAI.chat_with_openai(f"follower{index % distinct} followed, thank them properly", kind="follow")
+    replies.append(time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    sharkai.engine = AIEngine(
+        backend=FakeBackend(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            reply_tokens=args.reply_tokens,
+        ),
+        max_concurrency=args.concurrency,
+    )
+    sharkai.telemetry = AITelemetry()
+
+    first_sentences, mention_replies, event_replies = [], [], []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(mention(i, first_sentences, mention_replies) for i in range(args.mentions)),
+        *(event(i, args.distinct_events, event_replies) for i in range(args.events)),
+    )
+    elapsed = time.perf_counter() - started
+
+    total = sharkai.telemetry.snapshot()["total"]
+    print(f"{args.mentions} mentions + {args.events} events in {elapsed:.2f} s "
+          f"(concurrency {args.concurrency}, {total['calls']} backend calls, {total['errors']} errors)")
+    print(f"  mention first sentence: {_summary(first_sentences)}")
+    print(f"  mention full reply:     {_summary(mention_replies)}")
+    print(f"  event reply:            {_summary(event_replies)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mentions", type=int, default=40, help="concurrent streamed mentions")
+    parser.add_argument("--events", type=int, default=40, help="concurrent follow thank-yous")
+    parser.add_argument("--distinct-events", type=int, default=10, help="distinct follower names (the rest hit the cache)")
+    parser.add_argument("--concurrency", type=int, default=sharkai.AI_MAX_CONCURRENCY, help="engine concurrency cap")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="fake generation speed")
+    parser.add_argument("--reply-tokens", type=int, default=30, help="fake reply length")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark overlay polling against the database while chat is being ingested.
+
+Compares the old pattern (a fresh rollback-journal connection per call) with
+the shared WAL connection pool in database.py. One thread ingests chat like
+the chat store writer, while several threads poll like overlay browser
+sources hitting /api/chat and /api/links.
+
+    python bench_db.py [--readers 6] [--seconds 5]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from database import ConnectionPool
+from db_migrations import migrate
+
+CHAT_QUERY = """
+    SELECT from_user, message, platform, timestamp
+    FROM messages
+    ORDER BY timestamp DESC
+    LIMIT 50
+"""
+
+
+class PerCallConnections:
+    """The pre-pool behaviour: connect, run, close on every call."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def read(self) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(CHAT_QUERY).fetchall()
+            conn.execute("SELECT key, value FROM links").fetchall()
+        finally:
+            conn.close()
+
+    def write(self, rows: list[tuple]) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                "INSERT INTO messages (from_user, message, platform) VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class PooledConnections:
+    def __init__(self, db_path: str):
+        self.pool = ConnectionPool(db_path)
+
+    def read(self) -> None:
+        with self.pool.connection() as conn:
+            conn.execute(CHAT_QUERY).fetchall()
+            conn.execute("SELECT key, value FROM links").fetchall()
+
+    def write(self, rows: list[tuple]) -> None:
+        with self.pool.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO messages (from_user, message, platform) VALUES (?, ?, ?)",
+                rows,
+            )
+
+
+def run(strategy, readers: int, seconds: float) -> dict:
+    stop = threading.Event()
+    read_latencies = []
+    errors = []
+    writes = [0]
+    lock = threading.Lock()
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                strategy.read()
+            except sqlite3.Error as e:
+                errors.append(e)
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            read_latencies.extend(local)
+
+    def writer():
+        n = 0
+        while not stop.is_set():
+            rows = [(f"user{n % 40}", f"message {n + i}", "twitch") for i in range(5)]
+            try:
+                strategy.write(rows)
+                n += len(rows)
+            except sqlite3.Error as e:
+                errors.append(e)
+        writes[0] = n
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    read_latencies.sort()
+    return {
+        "reads": len(read_latencies),
+        "p50_ms": statistics.median(read_latencies) * 1000 if read_latencies else 0.0,
+        "p99_ms": read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0.0,
+        "messages_written": writes[0],
+        "errors": len(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=6, help="concurrent overlay pollers")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per strategy")
+    args = parser.parse_args()
+
+    for name, factory in (("per-call", PerCallConnections), ("wal-pool", PooledConnections)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            setup_pool = ConnectionPool(db_path)
+            migrate(setup_pool)
+            setup_pool.close()
+            if factory is PerCallConnections:
+                # Put the file back on the default rollback journal
+                conn = sqlite3.connect(db_path)
+                conn.execute("PRAGMA journal_mode=DELETE")
+                conn.close()
+            result = run(factory(db_path), args.readers, args.seconds)
+        print(
+            f"{name:>9}: {result['reads']:>7} reads "
+            f"(p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms), "
+            f"{result['messages_written']:>7} messages written, "
+            f"{result['errors']} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark MP3 duration lookup: header probe vs. pygame decoding.
+
+The bot used to decode every TTS clip with pygame.mixer.Sound just to read
+its length. mp3_probe.mp3_duration reads frame headers instead. Runs both
+over the given files (default: every clip in the TTS cache) and reports
+time per clip and the largest disagreement in duration.
+
+    python bench_mp3.py [files ...] [--repeat 5]
+
+pygame is optional; without it only the probe is timed.
+"""
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+
+from mp3_probe import mp3_duration
+from tts_cache import TTS_CACHE_DIR
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+def time_each(clips: list[bytes], measure, repeat: int) -> tuple[float, list[float]]:
+    """Median seconds per clip, and the durations measured."""
+    timings = []
+    durations = []
+    for _ in range(repeat):
+        durations = []
+        start = time.perf_counter()
+        for data in clips:
+            durations.append(measure(data))
+        timings.append((time.perf_counter() - start) / len(clips))
+    return statistics.median(timings), durations
+
+
+def pygame_duration(data: bytes) -> float:
+    return pygame.mixer.Sound(io.BytesIO(data)).get_length()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="MP3 files (default: the TTS cache)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the files")
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(TTS_CACHE_DIR, "*.mp3")))
+    if not paths:
+        parser.error(f"no MP3 files given and none found in {TTS_CACHE_DIR}/")
+    clips = []
+    for path in paths:
+        with open(path, "rb") as f:
+            clips.append(f.read())
+    total_bytes = sum(len(c) for c in clips)
+    print(f"{len(clips)} clips, {total_bytes / 1024:.0f} KB")
+
+    probe_time, probe_durations = time_each(clips, mp3_duration, args.repeat)
+    print(f"   probe: {probe_time * 1000:8.3f} ms/clip, {sum(d or 0 for d in probe_durations):.1f} s of audio")
+
+    if pygame is None:
+        print("  pygame: not installed, skipped")
+        return
+    pygame.mixer.init()
+    pygame_time, pygame_durations = time_each(clips, pygame_duration, args.repeat)
+    worst = max(abs((p or 0) - g) for p, g in zip(probe_durations, pygame_durations))
+    print(f"  pygame: {pygame_time * 1000:8.3f} ms/clip, {sum(pygame_durations):.1f} s of audio")
+    print(f"  probe is {pygame_time / probe_time:.0f}x faster, max difference {worst * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+
+from sharkai import SharkAI, engine, persona
+
+LOGGER = logging.getLogger("CannedResponses")
+
+# Configuration
+CANNED_POOL_SIZE = int(os.environ.get("CANNED_POOL_SIZE", "5"))  # Lines kept ready per event kind
+CANNED_REFILL_INTERVAL = float(os.environ.get("CANNED_REFILL_INTERVAL", "10"))  # Seconds between idle checks
+
+# Constants
+MAX_REJECTED_TEMPLATES = 3  # Unusable lines in a row before a kind waits for the next persona
+
+# What to ask for per event kind. Lines use {user} (and {count} for gifts)
+# as placeholders, filled in when the event arrives.
+CANNED_PROMPTS = {
+    "follow": "write one short thank-you message for a new follower. refer to them only as {user}.",
+    "sub": "write one short thank-you message for a new subscriber. refer to them only as {user}.",
+    "gift": "write one short thank-you message for someone who gifted subs. refer to them only as {user} and to the number of subs only as {count}.",
+    "raid": "write one short thank-you message for a streamer raiding the channel. refer to them only as {user}.",
+}
+
+# Fixed lines for when the pool is empty and the live request was dropped
+FALLBACK_REPLIES = {
+    "follow": "thanks for the follow, {user}!",
+    "sub": "thanks for subscribing, {user}!",
+    "gift": "thanks for the {count} gifted subs, {user}!",
+    "raid": "thanks for the raid, {user}! welcome in everyone",
+    "events": "thank you {user}, you're all awesome!",
+    "lurk": "enjoy the lurk, we'll keep the seat warm",
+}
+
+
+class CannedResponsePool:
+    """Pre-generated thank-you lines, so events get an instant reply.
+
+    A background task uses idle time (no AI call in flight) to keep up to
+    `pool_size` templated lines per kind. Each line is used once. Lines
+    remember the persona they were written for and are thrown away once
+    the persona (e.g. the current game) changes. A kind whose last
+    `max_rejected` lines were all unusable is not asked again until the
+    persona changes, so a model that ignores the placeholders doesn't cost
+    a stream of background completions.
+    """
+
+    def __init__(
+        self,
+        generate,
+        persona,
+        is_idle,
+        pool_size: int = CANNED_POOL_SIZE,
+        interval: float = CANNED_REFILL_INTERVAL,
+        max_rejected: int = MAX_REJECTED_TEMPLATES,
+    ):
+        self._generate = generate  # async (persona, instruction) -> str | None
+        self._persona = persona
+        self._is_idle = is_idle
+        self._pool_size = pool_size
+        self._interval = interval
+        self._max_rejected = max_rejected
+        self._rejected = {kind: 0 for kind in CANNED_PROMPTS}  # Unusable lines in a row for the current persona
+        self._rejected_persona = None
+        self._pools = {kind: deque() for kind in CANNED_PROMPTS}  # kind -> (persona, template)
+        self._lock = threading.Lock()
+        self._counters = {"served": 0, "empty": 0, "generated": 0, "rejected": 0, "fallback": 0}
+
+    def take(self, kind: str, user: str, count: int | None = None) -> str | None:
+        """A ready line for `kind` addressed to `user`, or None if there is none."""
+        current = self._persona()
+        with self._lock:
+            pool = self._pools.get(kind)
+            while pool:
+                written_for, template = pool.popleft()
+                if written_for == current:
+                    self._counters["served"] += 1
+                    return template.replace("{user}", user).replace("{count}", str(count))
+            self._counters["empty"] += 1
+            return None
+
+    def fallback(self, kind: str, user: str, count: int | None = None) -> str:
+        """A fixed reply, for when neither the pool nor a live request answered."""
+        self._count("fallback")
+        template = FALLBACK_REPLIES.get(kind, FALLBACK_REPLIES["events"])
+        return template.replace("{user}", user).replace("{count}", str(count))
+
+    async def run(self) -> None:
+        """Keep the pools topped up until cancelled."""
+        while True:
+            try:
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.error(f"Error refilling canned responses: {e}")
+            await asyncio.sleep(self._interval)
+
+    async def _refill(self) -> None:
+        current = self._persona()
+        if current != self._rejected_persona:
+            self._rejected_persona = current
+            self._rejected = dict.fromkeys(self._rejected, 0)
+        for kind, instruction in CANNED_PROMPTS.items():
+            if self._rejected[kind] >= self._max_rejected:
+                continue  # Given up on this kind until the persona changes
+            with self._lock:
+                pool = self._pools[kind]
+                kept = [entry for entry in pool if entry[0] == current]
+                pool.clear()
+                pool.extend(kept)
+                missing = self._pool_size - len(pool)
+            for _ in range(missing):
+                # Live requests come first; try again on the next tick
+                if not self._is_idle():
+                    return
+                template = await self._generate(current, instruction)
+                if not template or "{user}" not in template or ("{count}" in instruction and "{count}" not in template):
+                    self._count("rejected")
+                    self._rejected[kind] += 1
+                    if self._rejected[kind] >= self._max_rejected:
+                        LOGGER.warning(f"{self._rejected[kind]} unusable {kind} lines in a row, pausing until the persona changes")
+                        break
+                    continue
+                self._rejected[kind] = 0
+                with self._lock:
+                    self._pools[kind].append((current, template))
+                self._count("generated")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._counters,
+                ready={kind: len(pool) for kind, pool in self._pools.items()},
+                paused=[kind for kind, rejected in self._rejected.items() if rejected >= self._max_rejected],
+            )
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._counters[outcome] += 1
+
+
+canned_responses = CannedResponsePool(SharkAI.canned_template, persona, engine.idle)
@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+from chat_store import chat_store
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # Not installed, or the encoding could not be loaded offline
+    _ENCODING = None
+
+# Constants
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("AI_CONTEXT_TOKENS", "600"))
+SUMMARY_TOKEN_BUDGET = 120
+SUMMARY_SNIPPET_LENGTH = 60
+CONTEXT_HEADER = "this is the previous chat messages: "
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when available, else the ~4 chars/token rule."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+class ChatContext:
+    """Keeps the chat transcript that is prepended to AI prompts.
+
+    Lines are formatted once, as messages arrive, instead of rereading and
+    joining the whole history on every call. When the transcript exceeds its
+    token budget, the oldest lines are folded into a short rolling summary
+    of who said what, so prompt size stays flat however busy chat gets.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self._token_budget = token_budget
+        self._summary_budget = summary_budget
+        self._lines = deque()  # (message id, user, line, tokens)
+        self._tokens = 0
+        self._summary = OrderedDict()  # user -> [message count, last snippet]
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    def attach(self, store) -> None:
+        """Follow a ChatStore's events, starting from what it holds now."""
+        store.events.add_listener(self._on_event)
+        self._reset(store.recent())
+
+    def render(self) -> str:
+        """The transcript for the next prompt ('' when chat is empty)."""
+        with self._lock:
+            if self._rendered is None:
+                parts = []
+                summary = self._summary_text()
+                if summary:
+                    parts.append(summary)
+                parts.extend(line for _, _, line, _ in self._lines)
+                self._rendered = CONTEXT_HEADER + "\n".join(parts) + "\n" if parts else ""
+            return self._rendered
+
+    def token_count(self) -> int:
+        with self._lock:
+            return self._tokens + estimate_tokens(self._summary_text())
+
+    def _on_event(self, event: str, data: dict) -> None:
+        if event == "chat":
+            self._add(data)
+        elif event == "delete":
+            self._remove_user(data["user"])
+        elif event == "clear":
+            self._reset([])
+        elif event == "reload":
+            self._reset(data["messages"])
+
+    def _add(self, message: dict) -> None:
+        line = f"{message['user']}: {message['message']}"
+        tokens = estimate_tokens(line)
+        with self._lock:
+            self._lines.append((message["id"], message["user"], line, tokens))
+            self._tokens += tokens
+            while self._tokens > self._token_budget and len(self._lines) > 1:
+                _, user, old_line, old_tokens = self._lines.popleft()
+                self._tokens -= old_tokens
+                self._compact(user, old_line[len(user) + 2:])
+            self._rendered = None
+
+    def _compact(self, user: str, message: str) -> None:
+        """Fold an evicted line into the rolling summary."""
+        entry = self._summary.pop(user, [0, ""])
+        entry[0] += 1
+        snippet = message.strip()
+        if len(snippet) > SUMMARY_SNIPPET_LENGTH:
+            snippet = snippet[:SUMMARY_SNIPPET_LENGTH].rsplit(" ", 1)[0] + "..."
+        entry[1] = snippet
+        self._summary[user] = entry  # Most recently active last
+        while len(self._summary) > 1 and estimate_tokens(self._summary_text()) > self._summary_budget:
+            self._summary.popitem(last=False)
+
+    def _summary_text(self) -> str:
+        if not self._summary:
+            return ""
+        people = "; ".join(
+            f"{user} ({count} msg{'s' if count != 1 else ''}, last: \"{snippet}\")"
+            for user, (count, snippet) in self._summary.items()
+        )
+        return f"earlier in chat: {people}"
+
+    def _remove_user(self, user: str) -> None:
+        with self._lock:
+            kept = [entry for entry in self._lines if entry[1] != user]
+            self._lines = deque(kept)
+            self._tokens = sum(entry[3] for entry in kept)
+            self._summary.pop(user, None)
+            self._rendered = None
+
+    def _reset(self, messages: list[dict]) -> None:
+        with self._lock:
+            self._lines.clear()
+            self._tokens = 0
+            self._summary.clear()
+            self._rendered = None
+        for message in messages:
+            self._add(message)
+
+
+chat_context = ChatContext()
+chat_context.attach(chat_store)
@@ -0,0 +1,233 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from database import ConnectionPool, db
+from pubsub import Broadcaster
+
+LOGGER = logging.getLogger("ChatStore")
+
+# Constants
+MAX_MESSAGE_HISTORY = 50
+FLUSH_INTERVAL = 0.5  # Seconds the writer waits to collect a batch
+FLUSH_BATCH_SIZE = 200  # Maximum operations persisted per transaction
+
+
+def _julian_now() -> float:
+    """Current time as a Julian day, matching sqlite's julianday('now')."""
+    return time.time() / 86400.0 + 2440587.5
+
+
+class ChatStore:
+    """Keeps the last chat messages in memory and persists them in the background.
+
+    All reads (SharkAI context, /api/chat) are served from the ring buffer.
+    Writes are queued and flushed to the messages table in batches by a
+    writer thread, so the bot's event loop never waits on disk I/O.
+    Every change is also published on `events` ("chat", "delete", "clear",
+    and "reload" after loading from disk) for the overlay's push stream and
+    in-process listeners.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_messages: int = MAX_MESSAGE_HISTORY):
+        self._pool = pool
+        self._max_messages = max_messages
+        self._messages = deque(maxlen=max_messages)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._version = 0  # Bumped on every change; used for ETags
+        self._pending = queue.Queue()
+        self._stop_event = threading.Event()
+        self._writer_thread = None
+        self.events = Broadcaster()
+
+    def start(self) -> None:
+        """Load recent history from the database and start the writer thread."""
+        if self._writer_thread and self._writer_thread.is_alive():
+            return
+        self._load()
+        self._stop_event.clear()
+        self._writer_thread = threading.Thread(
+            target=self._writer_worker, name="chat-store-writer", daemon=True
+        )
+        self._writer_thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending writes and stop the writer thread."""
+        self._stop_event.set()
+        if self._writer_thread:
+            self._writer_thread.join(timeout)
+            self._writer_thread = None
+
+    def add(self, user: str, message: str, platform: str = "twitch") -> dict:
+        """Append a message to the ring buffer and queue it for persistence."""
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "user": user,
+                "message": message,
+                "platform": platform,
+                "timestamp": _julian_now(),
+            }
+            self._next_id += 1
+            self._version += 1
+            self._messages.append(entry)
+        self._pending.put(("insert", entry))
+        self.events.publish("chat", entry, entry["id"])
+        return entry
+
+    def recent(self, limit: int | None = None) -> list[dict]:
+        """Return buffered messages, oldest first."""
+        with self._lock:
+            messages = list(self._messages)
+        if limit is not None:
+            messages = messages[-limit:]
+        return messages
+
+    def snapshot(self, since_id: int | None = None, limit: int | None = None) -> tuple[int, int, list[dict]]:
+        """Return (version, last_id, messages newer than since_id) atomically.
+
+        A cursor ahead of the store (e.g. from before a restart) is treated
+        as no cursor so the client resynchronises.
+        """
+        with self._lock:
+            version = self._version
+            last_id = self._next_id - 1
+            if since_id is None or since_id > last_id:
+                messages = list(self._messages)
+            else:
+                messages = [m for m in self._messages if m["id"] > since_id]
+        if limit is not None:
+            messages = messages[-limit:]
+        return version, last_id, messages
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._messages)
+
+    def remove_user(self, user: str) -> int:
+        """Drop every message from a user. Returns how many were buffered."""
+        with self._lock:
+            removed_ids = [m["id"] for m in self._messages if m["user"] == user]
+            kept = [m for m in self._messages if m["user"] != user]
+            self._messages = deque(kept, maxlen=self._max_messages)
+            self._version += 1
+        self._pending.put(("delete_user", user))
+        self.events.publish("delete", {"user": user, "ids": removed_ids})
+        return len(removed_ids)
+
+    def clear(self) -> None:
+        """Forget all buffered messages."""
+        with self._lock:
+            self._messages.clear()
+            self._version += 1
+        self._pending.put(("clear", None))
+        self.events.publish("clear", {})
+
+    def _load(self) -> None:
+        """Seed the buffer from the last persisted messages."""
+        try:
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, from_user, message, platform, timestamp
+                    FROM messages
+                    ORDER BY id DESC
+                    LIMIT ?
+                    """,
+                    (self._max_messages,),
+                ).fetchall()
+                # sqlite_sequence survives the startup clear, so ids (and the
+                # overlay's since cursor) keep increasing across restarts
+                max_id = conn.execute(
+                    "SELECT MAX(seq) FROM sqlite_sequence WHERE name = 'messages'"
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            LOGGER.warning(f"Could not load chat history: {e}")
+            return
+
+        with self._lock:
+            self._messages.clear()
+            for row in reversed(rows):
+                self._messages.append(
+                    {
+                        "id": row[0],
+                        "user": row[1],
+                        "message": row[2],
+                        "platform": row[3] or "twitch",
+                        "timestamp": row[4],
+                    }
+                )
+            self._next_id = max(self._next_id, (max_id or 0) + 1)
+            self._version += 1
+            loaded = list(self._messages)
+        self.events.publish("reload", {"messages": loaded})
+
+    def _writer_worker(self) -> None:
+        """Drain the pending queue and persist operations in batches."""
+        # The writer holds one pooled connection for its whole lifetime
+        with self._pool.connection() as conn:
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    try:
+                        self._persist(conn, batch)
+                    except sqlite3.Error as e:
+                        conn.rollback()
+                        LOGGER.error(f"Error persisting chat messages: {e}")
+                elif self._stop_event.is_set():
+                    break
+        LOGGER.info("Chat store writer stopped")
+
+    def _next_batch(self) -> list[tuple]:
+        try:
+            batch = [self._pending.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        while len(batch) < FLUSH_BATCH_SIZE:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _persist(self, conn: sqlite3.Connection, batch: list[tuple]) -> None:
+        """Apply a batch in order inside a single transaction."""
+        cursor = conn.cursor()
+        inserts = []
+
+        def flush_inserts():
+            if inserts:
+                cursor.executemany(
+                    "INSERT INTO messages (id, from_user, message, platform, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    inserts,
+                )
+                inserts.clear()
+
+        for op, value in batch:
+            if op == "insert":
+                inserts.append(
+                    (value["id"], value["user"], value["message"], value["platform"], value["timestamp"])
+                )
+                continue
+            flush_inserts()
+            if op == "delete_user":
+                cursor.execute("DELETE FROM messages WHERE from_user = ?", (value,))
+            elif op == "clear":
+                cursor.execute("DELETE FROM messages;")
+        flush_inserts()
+
+        # Keep the table bounded like the in-memory buffer: only the last
+        # max_messages ids ever added can still be buffered
+        with self._lock:
+            last_id = self._next_id - 1
+        cursor.execute(
+            "DELETE FROM messages WHERE id <= ?", (last_id - self._max_messages,)
+        )
+        conn.commit()
+
+
+chat_store = ChatStore(db)
@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger("CircuitBreaker")
+
+
+class CircuitBreaker:
+    """Tracks a backend's health and stops calling it while it is failing.
+
+    Closed: calls go through. After `failure_threshold` consecutive
+    failures (a call slower than `slow_threshold` counts as one) the
+    breaker opens and allow() returns False. After the next delay from
+    `schedule` it goes half-open and lets one probe call through: success
+    closes it, failure opens it again for the following (longer) delay.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 2, slow_threshold: float = 4.0, schedule: tuple[float, ...] = (10.0, 30.0, 60.0, 120.0)):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._slow_threshold = slow_threshold
+        self._schedule = schedule
+        self._state = "closed"
+        self._failures = 0
+        self._trips = 0  # Consecutive opens; picks the delay from the schedule
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """Whether to call the backend now. In half-open, only one caller gets True."""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() >= self._retry_at:
+                self._state = "half-open"
+                LOGGER.info(f"{self.name}: half-open, probing")
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self, latency: float = 0.0) -> None:
+        if latency > self._slow_threshold:
+            self.record_failure(f"slow ({latency:.1f}s)")
+            return
+        with self._lock:
+            self._counters["successes"] += 1
+            self._failures = 0
+            if self._state != "closed":
+                LOGGER.info(f"{self.name}: recovered, closing")
+            self._state = "closed"
+            self._trips = 0
+
+    def record_failure(self, reason: str = "") -> None:
+        with self._lock:
+            self._counters["failures"] += 1
+            self._failures += 1
+            if self._state == "half-open" or self._failures >= self._failure_threshold:
+                delay = self._schedule[min(self._trips, len(self._schedule) - 1)]
+                self._trips += 1
+                self._state = "open"
+                self._retry_at = time.monotonic() + delay
+                self._counters["opened"] += 1
+                LOGGER.warning(f"{self.name}: open for {delay:g}s after failure {reason}".rstrip())
+
+    def record_cancelled(self) -> None:
+        """A call was abandoned. If it was the half-open probe, count it as a
+        failure; otherwise the breaker would stay half-open for good."""
+        with self._lock:
+            probing = self._state == "half-open"
+        if probing:
+            self.record_failure("probe cancelled")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._counters,
+                state=self._state,
+                consecutive_failures=self._failures,
+                retry_in=max(0.0, self._retry_at - time.monotonic()) if self._state == "open" else 0.0,
+            )
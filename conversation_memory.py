@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict, deque
+
+# Constants
+MAX_REMEMBERED_USERS = 200
+MAX_TURNS_PER_USER = 6  # Messages (prompt + reply each count as one)
+
+
+class ConversationMemory:
+    """Recent AI exchanges per chatter, keyed by (platform, user).
+
+    Each chatter keeps at most `max_turns` messages, and once more than
+    `max_users` chatters are remembered the least recently active one is
+    forgotten. A prompt therefore only carries that chatter's own history.
+    """
+
+    def __init__(self, max_users: int = MAX_REMEMBERED_USERS, max_turns: int = MAX_TURNS_PER_USER):
+        self._max_users = max_users
+        self._max_turns = max_turns
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def turns(self, user: str, platform: str = "twitch") -> list[dict]:
+        key = (platform, user.lower())
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                return []
+            self._conversations.move_to_end(key)
+            return list(conversation)
+
+    def remember(self, user: str, turns: list[dict], platform: str = "twitch") -> None:
+        key = (platform, user.lower())
+        with self._lock:
+            conversation = self._conversations.pop(key, None)
+            if conversation is None:
+                conversation = deque(maxlen=self._max_turns)
+            conversation.extend(turns)
+            self._conversations[key] = conversation
+            while len(self._conversations) > self._max_users:
+                self._conversations.popitem(last=False)
+
+    def forget(self, user: str, platform: str = "twitch") -> None:
+        with self._lock:
+            self._conversations.pop((platform, user.lower()), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conversations.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+
+conversation_memory = ConversationMemory()
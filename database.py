@@ -0,0 +1,81 @@
+import logging
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger("Database")
+
+SQL_DB_PATH = os.environ.get("SQL_CONNECT", "messages.db")
+
+# Constants
+BUSY_TIMEOUT_MS = 5000  # How long a connection waits on a lock before failing
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+MAX_IDLE_CONNECTIONS = 8
+
+
+class ConnectionPool:
+    """Shares sqlite connections between the bot and the Flask threads.
+
+    Connections are opened once in WAL mode, so readers never block the
+    writer and vice versa, and are handed back to the pool after each use.
+    Because each connection lives for the whole process, sqlite3's
+    per-connection statement cache keeps the hot queries prepared.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = MAX_IDLE_CONNECTIONS):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # Connections move between threads via the pool
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        # NORMAL is durable across application crashes in WAL mode and skips
+        # an fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success, roll back on error."""
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+db = ConnectionPool(SQL_DB_PATH)
@@ -0,0 +1,70 @@
+import logging
+import sqlite3
+
+from database import ConnectionPool
+
+LOGGER = logging.getLogger("Migrations")
+
+
+def _create_tables(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_user TEXT NOT NULL,
+            message TEXT NOT NULL,
+            platform TEXT DEFAULT 'twitch',
+            timestamp REAL DEFAULT (julianday('now'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS links (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+
+
+def _add_message_columns(cursor: sqlite3.Cursor) -> None:
+    """Older databases were created before platform/timestamp existed."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(messages)")}
+    if "platform" not in columns:
+        cursor.execute("ALTER TABLE messages ADD COLUMN platform TEXT DEFAULT 'twitch'")
+    if "timestamp" not in columns:
+        cursor.execute(
+            "ALTER TABLE messages ADD COLUMN timestamp REAL DEFAULT (julianday('now'))"
+        )
+
+
+def _add_message_indexes(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_from_user ON messages(from_user)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_platform ON messages(platform)"
+    )
+
+
+# Applied in order; the database's user_version records how many have run.
+# Only ever append to this list.
+MIGRATIONS = [
+    _create_tables,
+    _add_message_columns,
+    _add_message_indexes,
+]
+
+
+def migrate(pool: ConnectionPool) -> int:
+    """Bring the database schema up to date. Returns the resulting version."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for index, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            LOGGER.info(f"Applying migration {index}: {migration.__name__}")
+            migration(cursor)
+            # PRAGMA does not accept bound parameters
+            cursor.execute(f"PRAGMA user_version = {index}")
+            conn.commit()
+        return max(version, len(MIGRATIONS))
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+LOGGER = logging.getLogger("EventAggregator")
+
+# Configuration
+EVENT_BATCH_WINDOW = float(os.environ.get("EVENT_BATCH_WINDOW", "3"))  # Quiet seconds that close a batch
+EVENT_BATCH_MAX_WINDOW = float(os.environ.get("EVENT_BATCH_MAX_WINDOW", "15"))  # Longest a batch stays open
+EVENT_BATCH_MAX_SIZE = int(os.environ.get("EVENT_BATCH_MAX_SIZE", "25"))
+
+
+@dataclass
+class ChannelEvent:
+    kind: str  # "follow", "sub" or "gift"
+    user: str
+    detail: str | int | float | None = None  # Sub tier or gift count
+    payload: object = None  # Original eventsub payload, used for replying
+    received: float = field(default_factory=time.monotonic)
+
+
+def join_names(names: list[str]) -> str:
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def describe_batch(events: list[ChannelEvent]) -> tuple[str, str]:
+    """Build (prompt, kind) for a batch. A single event keeps its usual prompt."""
+    if len(events) == 1:
+        event = events[0]
+        if event.kind == "follow":
+            return f"{event.user} followed, thank them properly", "follow"
+        if event.kind == "sub":
+            return f"{event.user} just subscribed with tier {event.detail}, thank them", "sub"
+        return f"{event.user} just gifted {event.detail} subs, thank them", "gift"
+
+    parts = []
+    followers = [e.user for e in events if e.kind == "follow"]
+    if followers:
+        parts.append(f"{join_names(followers)} followed")
+    subs = [f"{e.user} (tier {e.detail})" for e in events if e.kind == "sub"]
+    if subs:
+        parts.append(f"{join_names(subs)} subscribed")
+    gifts = [f"{e.user} gifted {e.detail} subs" for e in events if e.kind == "gift"]
+    parts.extend(gifts)
+
+    kinds = {e.kind for e in events}
+    kind = kinds.pop() if len(kinds) == 1 else "events"
+    prompt = "; ".join(parts) + ". thank all of them together in one short message"
+    return prompt, kind
+
+
+class EventAggregator:
+    """Collects follow/sub/gift events and hands them over in batches.
+
+    A batch closes once no new event has arrived for `window` seconds, once
+    it has been open for `max_window` seconds, or once it holds `max_size`
+    events, whichever comes first. A lone event therefore waits at most
+    `window`, while a follow train or gift bomb produces one batch.
+    """
+
+    def __init__(
+        self,
+        on_batch,
+        window: float = EVENT_BATCH_WINDOW,
+        max_window: float = EVENT_BATCH_MAX_WINDOW,
+        max_size: int = EVENT_BATCH_MAX_SIZE,
+    ):
+        self._on_batch = on_batch
+        self._window = window
+        self._max_window = max_window
+        self._max_size = max_size
+        self._pending = []
+        self._deadline = 0.0
+        self._hard_deadline = 0.0
+        self._task = None
+        self._batch_tasks = set()  # Referenced until done, so they can't be garbage-collected
+
+    def add(self, event: ChannelEvent) -> None:
+        now = time.monotonic()
+        if not self._pending:
+            self._hard_deadline = now + self._max_window
+        self._pending.append(event)
+        self._deadline = min(now + self._window, self._hard_deadline)
+
+        if len(self._pending) >= self._max_size:
+            self._dispatch()
+        elif self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._wait_and_dispatch())
+
+    async def _wait_and_dispatch(self) -> None:
+        while self._pending:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                self._dispatch()
+                return
+            await asyncio.sleep(remaining)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        if batch:
+            LOGGER.info(f"Dispatching batch of {len(batch)} channel events")
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: list[ChannelEvent]) -> None:
+        try:
+            await self._on_batch(batch)
+        except Exception as e:
+            LOGGER.error(f"Error handling event batch: {e}", exc_info=True)
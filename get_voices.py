@@ -1,12 +1,15 @@
-import edge_tts
 import asyncio
+import sys
 
+from tts_backends import list_voices
 
-async def list_voices():
-    voices = await edge_tts.list_voices()
+
+async def print_voices(refresh: bool):
+    # Served from voice_catalog.json while it is fresh; pass --refresh to refetch
+    voices = await list_voices(refresh=refresh)
     for voice in voices:
         print({'country': voice.get('FriendlyName', 'N/A'),
                'gender': voice.get('Gender', 'N/A'),
                'code': voice.get('ShortName', 'N/A')})
 
-asyncio.run(list_voices())
+asyncio.run(print_voices("--refresh" in sys.argv))
@@ -0,0 +1,6 @@
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """The value `fraction` of the way through an ascending list (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
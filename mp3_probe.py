@@ -0,0 +1,117 @@
+"""MP3 duration from frame headers, without decoding any audio.
+
+Reads the Xing/Info or VBRI header when the file has one that covers the
+whole file; otherwise walks the frame headers (4 bytes each) and adds up
+their sample counts. Walking also handles what the TTS pipeline produces:
+several MP3s concatenated back to back, each with its own ID3 tag and
+Xing frame.
+"""
+import struct
+
+# kbps by [version is MPEG-1][layer]; index 0 ("free") and 15 are invalid
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _parse_header(data: bytes, pos: int):
+    """(frame length, samples, sample rate, header offset of Xing) or None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 0x3
+    layer = 4 - ((b1 >> 1) & 0x3)  # 1, 2 or 3; 4 is reserved
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x1
+    mono = (b3 >> 6) == 3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or mpeg1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return length, samples, sample_rate, 4 + side_info
+
+
+def _id3v2_size(data: bytes, pos: int) -> int:
+    """Total size of an ID3v2 tag at pos (0 if there is none)."""
+    if data[pos:pos + 3] != b"ID3" or pos + 10 > len(data):
+        return 0
+    size = 0
+    for byte in data[pos + 6:pos + 10]:
+        size = (size << 7) | (byte & 0x7F)  # Syncsafe
+    footer = 10 if data[pos + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _vbr_header(data: bytes, pos: int, xing_offset: int):
+    """(frames, bytes or None) from a Xing/Info or VBRI header in the frame at pos."""
+    at = pos + xing_offset
+    if data[at:at + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, at + 4)[0] if at + 8 <= len(data) else 0
+        if not flags & 0x1 or at + 12 > len(data):
+            return None
+        frames = struct.unpack_from(">I", data, at + 8)[0]
+        size = struct.unpack_from(">I", data, at + 12)[0] if flags & 0x2 and at + 16 <= len(data) else None
+        return frames, size
+    at = pos + 36
+    if data[at:at + 4] == b"VBRI" and at + 18 <= len(data):
+        size, frames = struct.unpack_from(">II", data, at + 10)
+        return frames, size
+    return None
+
+
+def mp3_duration(data: bytes) -> float | None:
+    """Duration of MP3 audio in seconds, or None if no frames were found."""
+    n = len(data)
+    pos = _id3v2_size(data, 0)
+
+    # Fast path: a VBR header whose byte count spans the rest of the file
+    first = _parse_header(data, pos)
+    if first:
+        vbr = _vbr_header(data, pos, first[3])
+        if vbr and vbr[1] and pos + vbr[1] >= n - 128 - first[0]:
+            return vbr[0] * first[1] / first[2]
+
+    seconds = 0.0
+    found = False
+    while pos + 4 <= n:
+        tag = _id3v2_size(data, pos)
+        if tag:
+            pos += tag
+            continue
+        header = _parse_header(data, pos)
+        if header is None:
+            if data[pos:pos + 3] == b"TAG" and n - pos == 128:
+                break  # ID3v1 trailer
+            pos = data.find(b"\xff", pos + 1)  # Resync on the next possible frame
+            if pos < 0:
+                break
+            continue
+        length, samples, sample_rate, xing_offset = header
+        found = True
+        # Xing/Info/VBRI frames carry metadata, not audio
+        if _vbr_header(data, pos, xing_offset) is None:
+            seconds += samples / sample_rate
+        pos += max(length, 4)
+    return seconds if found else None
+
+
+def probe_file(path: str) -> float | None:
+    with open(path, "rb") as f:
+        return mp3_duration(f.read())
@@ -0,0 +1,95 @@
+import json
+import logging
+import queue
+import threading
+
+LOGGER = logging.getLogger("PubSub")
+
+# Constants
+SUBSCRIBER_QUEUE_SIZE = 256  # Events buffered per subscriber before it is dropped
+HEARTBEAT_INTERVAL = 15.0  # Seconds between SSE keep-alive comments
+
+
+class Broadcaster:
+    """Fans events out to any number of subscribers on other threads.
+
+    Publishing never blocks: a subscriber that falls too far behind is
+    disconnected instead of slowing down the publisher (the bot's event loop).
+    """
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self._max_queue = max_queue
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        subscription = queue.Queue(maxsize=self._max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def add_listener(self, callback) -> None:
+        """Call `callback(event, data)` synchronously on every publish.
+
+        For cheap in-process bookkeeping only; it runs on the publisher's thread.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: dict, event_id: int | str | None = None) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event, data)
+            except Exception as e:
+                LOGGER.error(f"Event listener failed on {event}: {e}")
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait((event, data, event_id))
+            except queue.Full:
+                LOGGER.warning("Dropping slow event subscriber")
+                self.unsubscribe(subscription)
+                # Wake the consumer so it notices the disconnect
+                with subscription.mutex:
+                    subscription.queue.clear()
+                subscription.put_nowait(None)
+
+
+def format_sse(event: str, data: dict, event_id: int | str | None = None) -> str:
+    """Encode one Server-Sent Events frame."""
+    frame = f"event: {event}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def sse_stream(broadcaster: Broadcaster, subscription: queue.Queue):
+    """Yield SSE frames for a subscription until the client goes away.
+
+    Keep-alive comments are sent while idle so disconnected clients are
+    noticed (and unsubscribed) even when nothing is being published.
+    """
+    try:
+        while True:
+            try:
+                item = subscription.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            event, data, event_id = item
+            yield format_sse(event, data, event_id)
+    finally:
+        broadcaster.unsubscribe(subscription)
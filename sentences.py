@@ -0,0 +1,45 @@
+import re
+
+# Constants
+MIN_SENTENCE_LENGTH = 12  # Shorter fragments ("lol.", "e.g.") are joined with what follows
+
+_BOUNDARY = re.compile(r"([.!?]+[\"')\]]*)\s+")
+
+
+def split_sentences(text: str, min_length: int = MIN_SENTENCE_LENGTH) -> list[str]:
+    """Split text at sentence boundaries, merging fragments under min_length forward."""
+    buffer = SentenceBuffer(min_length)
+    sentences = buffer.feed(text)
+    tail = buffer.flush()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class SentenceBuffer:
+    """Turns a stream of text deltas into complete sentences.
+
+    feed() returns the sentences completed by the new text; flush() returns
+    whatever is left once the stream ends.
+    """
+
+    def __init__(self, min_length: int = MIN_SENTENCE_LENGTH):
+        self._min_length = min_length
+        self._text = ""
+
+    def feed(self, delta: str) -> list[str]:
+        self._text += delta
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._text):
+            sentence = self._text[start:match.end(1)].strip()
+            if len(sentence) < self._min_length:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        self._text = self._text[start:]
+        return sentences
+
+    def flush(self) -> str:
+        tail, self._text = self._text.strip(), ""
+        return tail
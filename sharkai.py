@@ -1,85 +1,307 @@
-from openai import OpenAI
+import asyncio
+import logging
 import os
+import time
 from dotenv import load_dotenv
-import sqlite3
+
+from ai_backends import create_backend
+from ai_cache import response_cache
+from ai_scheduler import AI_MAX_CONCURRENCY, AIScheduler, RequestExpired
+from ai_telemetry import telemetry
+from chat_context import chat_context
+from conversation_memory import conversation_memory
+from sentences import SentenceBuffer
 
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
+LOGGER = logging.getLogger("SharkAI")
+
+# Constants
+AI_REQUEST_TIMEOUT = float(os.environ.get("AI_REQUEST_TIMEOUT", "20"))
 
 current_game = 'path of exile'
-prompt = f"you are a chat bot for twitch chat on a channel about {current_game}, try to stay relevant on the game. from now on make sure that the message is a short paragraph less than 3 sentences unless asked otherwise. answer as a sassy bot that will include jokes in the response and is witty and funny."
-history = [{"role": "user", "content": prompt}]
+PERSONA = "you are a chat bot for twitch chat on a channel about {game}, try to stay relevant on the game. from now on make sure that the message is a short paragraph less than 3 sentences unless asked otherwise. answer as a sassy bot that will include jokes in the response and is witty and funny."
+
+
+def persona() -> str:
+    """The system prompt for the current game."""
+    return PERSONA.format(game=current_game)
+
+
+class AIEngine:
+    """Runs completions on the event loop without blocking it.
+
+    Completions come from `backend` (see ai_backends.py; chosen with
+    AI_BACKEND by default). Requests wait for a slot from the priority
+    scheduler (see ai_scheduler.py), which raises RequestExpired for ones
+    queued too long. Each request is bounded by `timeout`, and every
+    in-flight request can be cancelled (e.g. on shutdown) with cancel_all().
+    """
+
+    def __init__(self, backend=None, max_concurrency: int = AI_MAX_CONCURRENCY, timeout: float = AI_REQUEST_TIMEOUT):
+        self.backend = backend or create_backend()
+        self.timeout = timeout
+        self.scheduler = AIScheduler(max_concurrency)
+        self._in_flight = set()
+
+    async def complete(self, kind: str = "other", context_tokens: int = 0, timeout: float | None = None, **kwargs):
+        """Create a chat completion; raises asyncio.TimeoutError when it takes too long.
+
+        Every call is recorded in telemetry under `kind`.
+        """
+        kwargs.setdefault("model", self.backend.model)
+        async with self.scheduler.slot(kind):
+            task = asyncio.ensure_future(self.backend.create(**kwargs))
+            self._in_flight.add(task)
+            started = time.perf_counter()
+            try:
+                completion = await asyncio.wait_for(task, timeout or self.timeout)
+            except (Exception, asyncio.CancelledError) as e:
+                telemetry.record(
+                    kind, kwargs.get("model", ""), time.perf_counter() - started,
+                    context_tokens=context_tokens, error=type(e).__name__,
+                )
+                raise
+            finally:
+                self._in_flight.discard(task)
+            usage = getattr(completion, "usage", None)
+            telemetry.record(
+                kind, kwargs.get("model", ""), time.perf_counter() - started,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                context_tokens=context_tokens,
+            )
+            return completion
+
+    async def stream(self, kind: str = "other", context_tokens: int = 0, timeout: float | None = None, **kwargs):
+        """Yield completion text deltas as they arrive.
+
+        `timeout` bounds the wait for the response to start and for each
+        following chunk, so a stalled stream fails instead of hanging.
+        Telemetry records time to first token as well as the total.
+
+        The response is read by a separate task into a queue, so the
+        scheduler slot is freed as soon as the model is done, however long
+        the caller spends between chunks, and cancel_all() cancels only
+        that task, not the caller.
+        """
+        timeout = timeout or self.timeout
+        kwargs.setdefault("model", self.backend.model)
+        deltas = asyncio.Queue()
+        producer = asyncio.ensure_future(self._read_stream(deltas, kind, context_tokens, timeout, kwargs))
+        try:
+            while (delta := await deltas.get()) is not None:
+                yield delta
+            await producer  # Raises whatever ended the stream early
+        finally:
+            producer.cancel()  # No-op once finished; the caller may stop reading early
+
+    async def _read_stream(self, deltas: asyncio.Queue, kind: str, context_tokens: int, timeout: float, kwargs: dict) -> None:
+        """Put the text deltas of a streamed completion on `deltas`, then None."""
+        try:
+            async with self.scheduler.slot(kind):
+                task = asyncio.current_task()
+                self._in_flight.add(task)
+                started = time.perf_counter()
+                first_token = None
+                usage = None
+                error = None
+                try:
+                    stream = await asyncio.wait_for(
+                        self.backend.create(
+                            stream=True, stream_options={"include_usage": True}, **kwargs
+                        ),
+                        timeout,
+                    )
+                    try:
+                        chunks = stream.__aiter__()
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                            except StopAsyncIteration:
+                                break
+                            if chunk.usage:
+                                usage = chunk.usage  # Sent on the final, choice-less chunk
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if first_token is None:
+                                    first_token = time.perf_counter() - started
+                                deltas.put_nowait(chunk.choices[0].delta.content)
+                    finally:
+                        await stream.close()
+                except (Exception, asyncio.CancelledError) as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    self._in_flight.discard(task)
+                    telemetry.record(
+                        kind, kwargs.get("model", ""), time.perf_counter() - started,
+                        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                        context_tokens=context_tokens,
+                        first_token_latency=first_token,
+                        error=error,
+                    )
+        finally:
+            deltas.put_nowait(None)  # Wake the reader, even on errors
+
+    def idle(self) -> bool:
+        """True when no request is in flight."""
+        return not self._in_flight
+
+    def cancel_all(self) -> None:
+        for task in list(self._in_flight):
+            task.cancel()
+
+
+engine = AIEngine()
 
 
 class SharkAI:
     def __init__(self, prompt=None):
         self.prompt = prompt
 
-    def chat_with_openai(prompt):
-        """Send a text prompt to OpenAI API and get the response."""
-        conn = None
+    def _build_conversation(prompt, user=None, platform="twitch"):
+        """Return (messages to send, new turns to remember) for a prompt.
+
+        Only `user`'s own recent exchanges are included; prompts without a
+        user (events, lurk) carry no conversation history at all.
+        """
+        # Transcript is maintained incrementally and kept within a token budget
+        message_history = chat_context.render()
+        
+        conversation_history = [{"role": "user", "content": prompt}]
+        chat_turn = [{'role': 'user', 'content': message_history}] if message_history else []
+        recent_history = conversation_memory.turns(user, platform) if user else []
+        
+        # System prompt first. The transcript is sent fresh each time but
+        # not remembered, so memory doesn't accumulate copies of it
+        full_conversation = [{"role": "user", "content": persona()}] + recent_history + chat_turn + conversation_history
+        return full_conversation, conversation_history
+
+    def _remember(user, platform, conversation_history, response):
+        """Store a finished exchange in the user's bounded memory."""
+        if user:
+            conversation_memory.remember(
+                user,
+                conversation_history + [{"role": "assistant", "content": response}],
+                platform,
+            )
+
+    async def chat_with_openai(prompt, kind="mention", user=None, platform="twitch"):
+        """Send a text prompt to OpenAI API and get the response.
+
+        `kind` names the caller (mention, raid, follow, sub, gift, lurk);
+        repeated prompts of cacheable kinds are answered from the cache.
+        Pass `user` to continue that chatter's conversation. Returns None
+        when the request was dropped for waiting too long in the queue.
+        """
+        return await response_cache.get_or_compute(
+            kind, prompt, lambda: SharkAI._chat(prompt, kind, user, platform)
+        )
+
+    async def _chat(prompt, kind, user, platform):
         try:
-            conn = sqlite3.connect(os.environ.get("SQL_CONNECT", "messages.db"))
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT from_user, message FROM messages ORDER BY id ASC")
-            messages = cursor.fetchall()
-            # Optimize: use list comprehension and join instead of string concatenation
-            if messages:
-                message_history = 'this is the previous chat messages: ' + '\n'.join(
-                    f'{msg[0]}: {msg[1]}' for msg in messages) + '\n'
-            else:
-                message_history = 'this is the previous chat messages: '
+            full_conversation, conversation_history = SharkAI._build_conversation(prompt, user, platform)
             
-            # Build conversation history with system prompt
-            conversation_history = [{"role": "user", "content": prompt}]
-            if message_history.strip() != 'this is the previous chat messages: ':
-                conversation_history.insert(0, {'role': 'user', 'content': message_history})
-            
-            # Limit history to prevent unbounded growth and high API costs
-            # Keep only the last 20 messages from history (preserving system prompt at start)
-            MAX_HISTORY_MESSAGES = 20
-            system_prompt = history[0] if history else None  # Preserve system prompt
-            recent_history = history[1:] if len(history) > 1 else []  # Skip system prompt
-            if len(recent_history) > MAX_HISTORY_MESSAGES:
-                recent_history = recent_history[-MAX_HISTORY_MESSAGES:]
-            
-            # Reconstruct full conversation with system prompt first
-            full_conversation = ([system_prompt] if system_prompt else []) + recent_history + conversation_history
-            
-            chat_completion = client.chat.completions.create(
+            chat_completion = await engine.complete(
+                kind=kind,
+                context_tokens=chat_context.token_count(),
                 messages=full_conversation,
                 # model="gpt-4.5-preview",
-                model="gpt-4o-mini",
                 # tools=[{"type": "web_search_preview"},],
             )
             response = chat_completion.choices[0].message.content
             
-            # Append to history but maintain size limit (preserve system prompt)
-            if system_prompt and history[0] != system_prompt:
-                history.insert(0, system_prompt)
-            history.extend(conversation_history)
-            history.append({"role": "assistant", "content": response})
-            # Trim history but keep system prompt
-            if len(history) > MAX_HISTORY_MESSAGES * 2 + 1:  # +1 for system prompt
-                history[:] = [history[0]] + history[-(MAX_HISTORY_MESSAGES * 2):]
-            
+            SharkAI._remember(user, platform, conversation_history, response)
             return response
+        except RequestExpired:
+            return None
+        except asyncio.TimeoutError:
+            LOGGER.warning("AI request timed out")
+            return "Error: the AI took too long to answer"
         except Exception as e:
             return f"Error: {e}"
-        finally:
-            if conn:
-                conn.close()
 
-    def search_open_ai(prompt):
+    async def stream_chat_with_openai(prompt, user=None, platform="twitch"):
+        """Like chat_with_openai, but yield the response sentence by sentence
+        as the completion streams in. Yields nothing if the request was
+        dropped for waiting too long."""
+        buffer = SentenceBuffer()
+        parts = []
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
+            full_conversation, conversation_history = SharkAI._build_conversation(prompt, user, platform)
+            async for delta in engine.stream(
+                kind="mention",
+                context_tokens=chat_context.token_count(),
+                messages=full_conversation,
+            ):
+                parts.append(delta)
+                for sentence in buffer.feed(delta):
+                    yield sentence
+            tail = buffer.flush()
+            if tail:
+                yield tail
+            SharkAI._remember(user, platform, conversation_history, "".join(parts))
+        except RequestExpired:
+            return
+        except asyncio.TimeoutError:
+            LOGGER.warning("AI stream timed out")
+            if not parts:
+                yield "Error: the AI took too long to answer"
+        except Exception as e:
+            LOGGER.error(f"AI stream error: {e}")
+            if not parts:
+                yield f"Error: {e}"
+
+    async def canned_template(persona_prompt, instruction):
+        """Write one reusable event reply for the canned response pool.
+
+        Returns None on failure; the pool just tries again later.
+        """
+        try:
+            completion = await engine.complete(
+                kind="canned",
+                messages=[
+                    {"role": "user", "content": persona_prompt},
+                    {"role": "user", "content": instruction + " reply with the message only."},
+                ],
+            )
+            return completion.choices[0].message.content.strip()
+        except RequestExpired:
+            pass  # Live requests were waiting; try again later
+        except asyncio.TimeoutError:
+            LOGGER.warning("Canned response generation timed out")
+        except Exception as e:
+            LOGGER.error(f"Canned response generation error: {e}")
+        return None
+
+    async def search_open_ai(prompt):
+        """Answer a search query; identical queries are served from the cache.
+
+        Returns None when the request was dropped for waiting too long.
+        """
+        return await response_cache.get_or_compute(
+            "search", prompt, lambda: SharkAI._search(prompt)
+        )
+
+    async def _search(prompt):
+        try:
+            result = await engine.complete(
+                kind="search",
                 messages=[{"role": "user", "content": prompt}],
                 tools=[{"type": "web_search"}])
-            return response
+            # Extract the response content from the OpenAI response object
+            if hasattr(result, "choices") and len(result.choices) > 0:
+                return (
+                    result.choices[0].message.content
+                    if hasattr(result.choices[0].message, "content")
+                    else str(result)
+                )
+            return str(result)
+        except RequestExpired:
+            return None
+        except asyncio.TimeoutError:
+            LOGGER.warning("AI search timed out")
+            return "Error: the search took too long"
         except Exception as e:
             return f"Error: {e}"
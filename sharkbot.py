@@ -5,20 +5,26 @@ import os
 import threading
 import time
 import queue
-import shutil
 import asqlite
 import twitchio
 from twitchio.ext import commands
 from twitchio import eventsub
-import pygame
 import winsound
-from gtts import gTTS
 import io
-from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
-import requests
 
-from sharkai import SharkAI
+from sharkai import SharkAI, engine as ai_engine
+from canned_responses import canned_responses
+from chat_store import chat_store
+from conversation_memory import conversation_memory
+from database import db
+from db_migrations import migrate
+from event_aggregator import ChannelEvent, EventAggregator, describe_batch, join_names
+from tts_backends import check_voice
+from tts_jobs import tts_jobs
+from tts_pipeline import tts_pipeline
+from tts_stream import playback
+from youtube_relay import youtube_relay
 
 from dotenv import load_dotenv
 
@@ -41,7 +47,6 @@ CLIENT_ID: str = os.environ.get("CLIENT_ID")
 CLIENT_SECRET: str = os.environ.get("CLIENT_SECRET")
 BOT_ID = os.environ.get("OWNER_ID")
 OWNER_ID = os.environ.get("OWNER_ID")
-SQL_DB_PATH = os.environ.get("SQL_CONNECT", "messages.db")
 
 
 
@@ -49,12 +54,10 @@ YOUTUBE_VIDEO_ID = os.environ.get("YOUTUBE_VIDEO_ID")
   # YouTube live stream video ID
 
 # Constants
-MAX_MESSAGE_HISTORY = 50
 MAX_MESSAGE_LENGTH = 900
 LONG_MESSAGE_THRESHOLD = 500
 FIRST_MESSAGE_CHUNK = 480
 SECOND_MESSAGE_CHUNK = 990
-TTS_FILE = "tts.mp3"
 BOT_NAME = "sharkothehuman"
 STREAMER_NAME = os.environ.get("STREAMER_NAME", "sharko51")
 
@@ -67,43 +70,30 @@ DEFAULT_LINKS = {
     "vid": "https://www.twitch.tv/sharko51/clip/PeppyCooperativeLasagnaRiPepperonis-TqCjkjPL7Pegl2LB",
     "mb": "",
 }
-# TTS Language: gTTS uses language codes like 'en' (English), 'en-au' (Australian English), etc.
-# Common options: 'en' (US), 'en-uk' (UK), 'en-au' (Australia), 'en-ca' (Canada)
-bot_language = "en"  # Australian English
-tld = "us"
+# TTS voice/language are configured in .env (see tts_backends.py)
 
 
 def init_links_database():
     """Initialize links database with default values if empty."""
     try:
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        # Ensure links table exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS links (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
-        # Check if table is empty
-        cursor.execute("SELECT COUNT(*) FROM links")
-        count = cursor.fetchone()[0]
-
-        # If empty, populate with defaults
-        if count == 0:
-            for key, value in DEFAULT_LINKS.items():
-                if value:  # Only insert non-empty defaults
-                    cursor.execute(
-                        """
-                        INSERT OR IGNORE INTO links (key, value)
-                        VALUES (?, ?)
-                    """,
-                        (key, value),
-                    )
-            conn.commit()
-            LOGGER.info("Initialized links database with default values")
-
-        conn.close()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            # Check if table is empty
+            cursor.execute("SELECT COUNT(*) FROM links")
+            count = cursor.fetchone()[0]
+
+            # If empty, populate with defaults
+            if count == 0:
+                for key, value in DEFAULT_LINKS.items():
+                    if value:  # Only insert non-empty defaults
+                        cursor.execute(
+                            """
+                            INSERT OR IGNORE INTO links (key, value)
+                            VALUES (?, ?)
+                        """,
+                            (key, value),
+                        )
+                LOGGER.info("Initialized links database with default values")
     except Exception as e:
         LOGGER.warning(f"Error initializing links database: {e}")
 
@@ -111,11 +101,10 @@ def init_links_database():
 def get_link_from_db(key: str) -> str:
     """Get a link from the database, with fallback to default."""
     try:
-        conn = sqlite3.connect(SQL_DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM links WHERE key = ?", (key,))
-        result = cursor.fetchone()
-        conn.close()
+        with db.connection() as conn:
+            result = conn.execute(
+                "SELECT value FROM links WHERE key = ?", (key,)
+            ).fetchone()
         if result and result[0]:
             return result[0]
     except Exception as e:
@@ -125,10 +114,6 @@ def get_link_from_db(key: str) -> str:
     return DEFAULT_LINKS.get(key, "")
 
 
-# Initialize pygame mixer once
-pygame.mixer.init()
-
-
 class Bot(commands.Bot):
     def __init__(self, *, token_database: asqlite.Pool) -> None:
         self.token_database = token_database
@@ -144,11 +129,18 @@ class Bot(commands.Bot):
         component = MyComponent(self)
         await self.add_component(component)
 
-        # Initialize TTS queue (needs event loop to exist)
-        component._tts_queue = asyncio.Queue()
-        
-        # Start TTS queue processor
-        component._tts_processor_task = asyncio.create_task(component._process_tts_queue())
+        # Start the TTS queue processor (also takes jobs from the TTS generator page)
+        component._tts_processor_task = tts_jobs.start(component._generate_tts_file)
+
+        # Warn early about a misspelled TTS_VOICE (catalog is cached on disk)
+        asyncio.create_task(check_voice(tts_pipeline.backend))
+
+        # Keep pre-generated event replies topped up in idle time
+        component._canned_task = asyncio.create_task(canned_responses.run())
+
+        # Relay Twitch chat to YouTube from one long-lived worker
+        if YOUTUBE_VIDEO_ID:
+            component._youtube_relay_task = asyncio.create_task(youtube_relay.run())
 
         # Start YouTube chat monitoring if configured
         if YOUTUBE_CHAT_AVAILABLE and YOUTUBE_VIDEO_ID:
@@ -214,29 +206,15 @@ class Bot(commands.Bot):
 class MyComponent(commands.Component):
     def __init__(self, bot: Bot):
         self.bot = bot
-        self._db_path = SQL_DB_PATH
         self._youtube_chat_task = None
         self._youtube_chat_thread = None
         self._youtube_chat_queue = None
         self._youtube_chat_stop_event = None
-        self._tts_lock = threading.Lock()  # Lock for TTS generation to prevent concurrent overwrites
-        self._tts_queue = None  # Queue for TTS requests (initialized in setup)
-        self._tts_processing = False  # Flag to track if TTS is currently being processed
         self._tts_processor_task = None  # Task that processes the TTS queue
-        self._current_tts_file = None  # Track the current TTS file being played
-
-    @contextmanager
-    def _get_db_connection(self):
-        """Get a database connection as a context manager."""
-        conn = sqlite3.connect(self._db_path)
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        # Follows/subs/gifts are thanked in batches (see event_aggregator.py)
+        self._event_aggregator = EventAggregator(self._thank_event_batch)
+        self._canned_task = None  # Task that refills the canned response pool
+        self._youtube_relay_task = None  # Task that sends relayed messages to YouTube
 
     @commands.Component.listener()
     async def event_message(self, payload: twitchio.ChatMessage) -> None:
@@ -254,44 +232,12 @@ class MyComponent(commands.Component):
         is_chatter = chatter_name != streamer_name
         is_command = message.startswith("!")
 
-        # Database operations
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-
-                if is_clear_command:
-                    cursor.execute("DELETE FROM messages;")
-                else:
-                    # Store all messages (including streamer)
-                    # Ensure platform and timestamp columns exist
-                    try:
-                        cursor.execute(
-                            "ALTER TABLE messages ADD COLUMN platform TEXT DEFAULT 'twitch'"
-                        )
-                        conn.commit()
-                    except sqlite3.OperationalError:
-                        pass  # Column already exists
-                    try:
-                        cursor.execute(
-                            "ALTER TABLE messages ADD COLUMN timestamp REAL DEFAULT (julianday('now'))"
-                        )
-                        conn.commit()
-                    except sqlite3.OperationalError:
-                        pass  # Column already exists
-
-                    # Optimize: combine count check and delete in one query if needed
-                    cursor.execute("SELECT COUNT(*) FROM messages")
-                    count = cursor.fetchone()[0]
-                    if count >= MAX_MESSAGE_HISTORY:
-                        cursor.execute(
-                            "DELETE FROM messages WHERE id = (SELECT id FROM messages ORDER BY id ASC LIMIT 1)"
-                        )
-                    cursor.execute(
-                        "INSERT INTO messages (from_user, message, platform, timestamp) VALUES (?, ?, ?, julianday('now'))",
-                        (chatter_name, message, "twitch"),
-                    )
-        except Exception as e:
-            LOGGER.error(f"Database error in event_message: {e}")
+        # Chat history lives in memory; the store persists it in the background
+        if is_clear_command:
+            chat_store.clear()
+        else:
+            # Store all messages (including streamer)
+            chat_store.add(chatter_name, message, "twitch")
 
         print(f"[TWITCH] [{chatter_name}]: {message}")
 
@@ -313,17 +259,24 @@ class MyComponent(commands.Component):
             if not cleaned_message:
                 cleaned_message = message  # Fallback if removal leaves nothing
 
-            response = SharkAI.chat_with_openai(
-                f"new message from {chatter_name}: {cleaned_message}, response"
-            )
-
-            # Send response in chunks if needed
-            await self.send_message(payload, response)
+            # Fan sentences out as they stream in: the first one goes to chat
+            # right away, and every sentence is queued for TTS in order
+            sentences = []
+            async for sentence in SharkAI.stream_chat_with_openai(
+                f"new message from {chatter_name}: {cleaned_message}, response",
+                user=chatter_name,
+            ):
+                if not sentences:
+                    await self.send_message(payload, sentence)
+                    await self.make_tts(f"{chatter_name} asked me; {cleaned_message}. {sentence}")
+                else:
+                    await self.make_tts(sentence)
+                sentences.append(sentence)
 
-            # Single TTS: question + response in one file
-            combined_tts = f"{chatter_name} asked me; {cleaned_message}. {response}"
-            await self.make_tts(combined_tts)
-            self.play_sound(TTS_FILE)
+            # Send the rest of the response in chunks if needed
+            rest = " ".join(sentences[1:])
+            if rest:
+                await self.send_message(payload, rest)
 
     @commands.Component.listener()
     async def event_stream_online(self, payload: twitchio.StreamOnline) -> None:
@@ -339,56 +292,59 @@ class MyComponent(commands.Component):
 
         prompt = f"an ad break has begun for {payload.duration}, thank the viewers for their patience. from then on treat the chat room as a clean new one."
 
-        try:
-            with self._get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM messages")
-                count = cursor.fetchone()[0]
-                LOGGER.info(f"Message count for ad break: {count}")
-                if count > 0:
-                    prompt += " recap the chat and mention the chatters by ."
-
-                # await self.send_message(payload, SharkAI.chat_with_openai(prompt))
-                cursor.execute("DELETE FROM messages;")
-        except Exception as e:
-            LOGGER.error(f"Database error in event_ad_break: {e}")
+        count = chat_store.count()
+        LOGGER.info(f"Message count for ad break: {count}")
+        if count > 0:
+            prompt += " recap the chat and mention the chatters by ."
+
+        # await self.send_message(payload, await SharkAI.chat_with_openai(prompt))
+        chat_store.clear()
 
     @commands.Component.listener()
     async def event_raid(self, payload: twitchio.ChannelRaid) -> None:
-        message = SharkAI.chat_with_openai(
-            f"{payload.from_broadcaster.name} is raiding, thank them"
+        raider = payload.from_broadcaster.name
+        message = (
+            canned_responses.take("raid", raider)
+            or await SharkAI.chat_with_openai(f"{raider} is raiding, thank them", kind="raid")
+            or canned_responses.fallback("raid", raider)
         )
         await self.send_message(payload, message)
 
     @commands.Component.listener()
     async def event_follow(self, payload: twitchio.ChannelFollow) -> None:
-        message = SharkAI.chat_with_openai(
-            f"{payload.user} followed, thank them properly"
-        )
-        await self.send_message(payload, message)
-        await self.make_tts(message)
-        self.play_sound(TTS_FILE)
+        self._event_aggregator.add(ChannelEvent("follow", str(payload.user), payload=payload))
 
     @commands.Component.listener()
     async def event_subscription(self, payload: twitchio.ChannelSubscribe) -> None:
         subscription_tier = int(payload.tier) / 1000
-        message = SharkAI.chat_with_openai(
-            f"{payload.user} just subscribed with tier {subscription_tier}, thank them"
+        self._event_aggregator.add(
+            ChannelEvent("sub", str(payload.user), subscription_tier, payload)
         )
-        await self.send_message(payload, message)
-        await self.make_tts(message)
-        self.play_sound(TTS_FILE)
 
     @commands.Component.listener()
     async def event_subscription_gift(
         self, payload: twitchio.ChannelSubscriptionGift
     ) -> None:
-        message = SharkAI.chat_with_openai(
-            f"{payload.user} just gifted {payload.total} subs, thank them"
+        self._event_aggregator.add(
+            ChannelEvent("gift", str(payload.user), payload.total, payload)
         )
-        await self.send_message(payload, message)
+
+    async def _thank_event_batch(self, events: list[ChannelEvent]) -> None:
+        """One AI thank-you, chat message and TTS clip for a burst of events."""
+        prompt, kind = describe_batch(events)
+        names = join_names(list(dict.fromkeys(e.user for e in events)))
+        count = sum(int(e.detail or 0) for e in events) if kind == "gift" else None
+        message = None
+        if kind != "events":
+            # Same kind of event throughout: a pre-generated line fits the whole batch
+            message = canned_responses.take(kind, names, count)
+        if message is None:
+            message = await SharkAI.chat_with_openai(prompt, kind=kind)
+        if message is None:
+            # Live request was dropped as stale
+            message = canned_responses.fallback(kind, names, count)
+        await self.send_message(events[-1].payload, message)
         await self.make_tts(message)
-        self.play_sound(TTS_FILE)
 
     @commands.Component.listener()
     async def event_automod_message_hold(
@@ -415,15 +371,10 @@ class MyComponent(commands.Component):
             if banned_user_name:
                 LOGGER.info(f"User {banned_user_name} was banned/timed out. Deleting their messages from database.")
                 
-                # Delete all messages from this user in the database
-                with self._get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "DELETE FROM messages WHERE from_user = ?",
-                        (banned_user_name,)
-                    )
-                    deleted_count = cursor.rowcount
-                    LOGGER.info(f"Deleted {deleted_count} messages from {banned_user_name}")
+                # Delete all messages from this user (memory now, database in the background)
+                deleted_count = chat_store.remove_user(banned_user_name)
+                conversation_memory.forget(banned_user_name)
+                LOGGER.info(f"Deleted {deleted_count} messages from {banned_user_name}")
             
             await self.send_message(payload, "RIPBOZO")
         except Exception as e:
@@ -523,24 +474,18 @@ class MyComponent(commands.Component):
 
     @commands.command()
     async def lurk(self, ctx: commands.Context) -> None:
-        message = SharkAI.chat_with_openai(
-            f"{ctx.chatter.name} is lurking, tell them a joke and thank for lurking"
-        )
+        message = await SharkAI.chat_with_openai(
+            f"{ctx.chatter.name} is lurking, tell them a joke and thank for lurking",
+            kind="lurk",
+        ) or canned_responses.fallback("lurk", ctx.chatter.name)
         await ctx.send(f"{ctx.chatter.mention} " + message)
 
     @commands.command()
     async def search(self, ctx: commands.Context, *, query: str) -> None:
         try:
-            result = SharkAI.search_open_ai(query)
-            # Extract the response content from the OpenAI response object
-            if hasattr(result, "choices") and len(result.choices) > 0:
-                response_text = (
-                    result.choices[0].message.content
-                    if hasattr(result.choices[0].message, "content")
-                    else str(result)
-                )
-            else:
-                response_text = str(result)
+            response_text = await SharkAI.search_open_ai(query)
+            if response_text is None:
+                response_text = "too busy to search right now, try again in a bit"
             await ctx.send(f"{ctx.chatter.mention} {response_text}")
         except Exception as e:
             LOGGER.error(f"Search error: {e}")
@@ -705,152 +650,39 @@ class MyComponent(commands.Component):
         finally:
             LOGGER.info("YouTube chat queue processing stopped")
 
-    async def _process_tts_queue(self) -> None:
-        """Process TTS queue one item at a time to prevent interruptions."""
-        while True:
-            try:
-                # Wait for a TTS request from the queue
-                text = await self._tts_queue.get()
-                
-                # Generate TTS and get actual duration
-                # This will wait for current file to finish if needed
-                actual_duration = await self._generate_tts_file(text)
-                
-                # The file has been generated and should start playing in OBS
-                # We don't need to wait here because the next TTS generation will wait
-                # for this one to finish (checked in _generate_tts_file)
-                # But we add a small buffer to ensure the file is detected by the overlay
-                await asyncio.sleep(1.0)
-                
-                LOGGER.info(f"TTS generated (duration: {actual_duration:.1f}s), ready for next TTS")
-                
-                # Mark task as done
-                self._tts_queue.task_done()
-                
-            except Exception as e:
-                LOGGER.error(f"Error processing TTS queue: {e}", exc_info=True)
-                await asyncio.sleep(1)
-
-    async def _generate_tts_file(self, text: str) -> float:
-        """Generate TTS audio file (internal method, called by queue processor).
-        Waits for current file to finish playing if needed.
-        Returns the duration in seconds of the generated file."""
-        # Use lock to prevent concurrent TTS generation from overwriting the file
-        with self._tts_lock:
-            # Check if tts.mp3 exists and wait for it to finish playing
-            # This is the file the overlay is actually playing from
-            if os.path.exists(TTS_FILE):
-                try:
-                    file_age = time.time() - os.path.getmtime(TTS_FILE)
-                    # Get the actual duration of the current file
-                    sound = pygame.mixer.Sound(TTS_FILE)
-                    current_file_duration = sound.get_length()
-                    
-                    # Check if file is still playing (age is less than duration + buffer)
-                    if file_age < (current_file_duration + 3):
-                        # File is still playing, wait for it to finish
-                        remaining_time = (current_file_duration + 3) - file_age
-                        if remaining_time > 0:
-                            LOGGER.info(f"Current TTS still playing ({file_age:.1f}s old, {current_file_duration:.1f}s duration), waiting {remaining_time:.1f}s before generating next")
-                            await asyncio.sleep(remaining_time)
-                except Exception as e:
-                    LOGGER.warning(f"Could not get current file duration: {e}")
-            
-            # Generate TTS with unique filename (timestamp-based)
-            timestamp = int(time.time() * 1000)  # milliseconds for uniqueness
-            unique_filename = f"tts_{timestamp}.mp3"
-            unique_filepath = os.path.abspath(unique_filename)
-
-            # Generate and save TTS to unique file with retry logic
-            max_retries = 3
-            retry_delay = 2
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        await asyncio.sleep(retry_delay * attempt)
-
-                    def generate_tts():
-                        tts = gTTS(text=text, lang=bot_language, slow=False, tld=tld)
-                        tts.save(unique_filepath)
+    async def _generate_tts_file(self, text: str, rate: float = 1.0):
+        """Synthesize one utterance and queue it for playback.
 
-                    loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(None, generate_tts)
-                    break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        LOGGER.error(f"TTS generation failed after {max_retries} attempts: {e}")
-                        raise
-                    LOGGER.warning(f"TTS generation attempt {attempt + 1} failed: {e}, retrying...")
-                    await asyncio.sleep(retry_delay)
-
-            await asyncio.sleep(0.1)
+        Runs jobs from tts_jobs one at a time; clips go onto the playback
+        queue as soon as synthesis starts, so the next one is usually ready
+        before the overlay acks the current one. `rate` > 1 speeds speech
+        up while the queue is backlogged. Returns the utterance's stream and
+        its duration in seconds.
+        """
+        # Queued right away; the overlay starts playing /api/tts/stream/<id>
+        # while audio is still being produced if nothing else is playing.
+        # Falls back to the offline engine if the TTS service is failing
+        stream, duration_seconds = await tts_pipeline.speak(text, rate)
+        if duration_seconds is not None:
+            LOGGER.info(f"TTS utterance {stream.id} generated (duration: {int(duration_seconds * 1000)}ms)")
+        else:
+            LOGGER.warning("Could not get TTS duration: no MP3 frames found")
+            estimated_chars = len(text)
+            estimated_words = estimated_chars / 4
+            estimated_duration = (estimated_words / 150) * 60
+            duration_seconds = max(2.0, min(30.0, estimated_duration / rate))
 
-            try:
-                sound = pygame.mixer.Sound(unique_filepath)
-                duration_seconds = sound.get_length()
-                duration_ms = int(duration_seconds * 1000)
-                LOGGER.info(f"TTS file generated: {unique_filepath} (duration: {duration_ms}ms)")
-            except Exception as e:
-                LOGGER.warning(f"Could not get TTS duration: {e}")
-                estimated_chars = len(text)
-                estimated_words = estimated_chars / 4
-                estimated_duration = (estimated_words / 150) * 60
-                duration_seconds = max(2.0, min(30.0, estimated_duration))
-
-            # Copy to main TTS_FILE for overlay/API, then delete previous unique file
-            try:
-                if os.path.exists(TTS_FILE):
-                    if os.path.islink(TTS_FILE):
-                        os.unlink(TTS_FILE)
-                    else:
-                        os.remove(TTS_FILE)
-                shutil.copy2(unique_filepath, TTS_FILE)
-
-                old_file = self._current_tts_file
-                self._current_tts_file = unique_filepath
-
-                # Delete old unique file immediately (overlay only uses tts.mp3)
-                if old_file:
-                    old_abs = os.path.abspath(old_file) if not os.path.isabs(old_file) else old_file
-                    if os.path.exists(old_abs) and old_abs != os.path.abspath(TTS_FILE):
-                        for attempt in range(3):
-                            try:
-                                os.remove(old_abs)
-                                LOGGER.debug(f"Cleaned up old TTS file: {old_abs}")
-                                break
-                            except Exception as e:
-                                if attempt < 2:
-                                    await asyncio.sleep(1.0)
-                                else:
-                                    LOGGER.warning(f"Could not clean up old TTS file {old_abs}: {e}")
-            except Exception as e:
-                LOGGER.warning(f"Error updating TTS file reference: {e}")
-
-            return duration_seconds
+        # Lets the queue move on if the overlay never acks this clip
+        playback.set_duration(stream.id, duration_seconds)
+        return stream, duration_seconds
 
     async def make_tts(self, text: str) -> None:
         """Queue TTS generation request."""
         # Add to queue instead of generating immediately
-        if self._tts_queue is None:
-            LOGGER.error("TTS queue not initialized, cannot queue TTS request")
-            return
-        await self._tts_queue.put(text)
-        LOGGER.debug(f"TTS request queued (queue size: {self._tts_queue.qsize()})")
-
-    def play_sound(self, file_name: str) -> None:
-        """Play sound file (for overlay - file is served via Flask API)."""
         try:
-            # Get duration using pygame for logging
-            sound = pygame.mixer.Sound(file_name)
-            duration_ms = int(sound.get_length() * 1000)
-
-            LOGGER.info(f"TTS file generated: {file_name} (duration: {duration_ms}ms)")
-            
-            # Note: The overlay will play the file via the Flask API endpoint /api/tts/audio
-            # We don't delete the file here - let the overlay handle playback
-            # The file will be overwritten on the next TTS generation
-        except Exception as e:
-            LOGGER.error(f"Error processing TTS file: {e}")
+            tts_jobs.submit(text)
+        except RuntimeError as e:
+            LOGGER.error(f"Cannot queue TTS request: {e}")
 
     async def send_message(self, payload, message: str) -> None:
         """Send message, splitting into chunks if necessary."""
@@ -901,128 +733,39 @@ class MyComponent(commands.Component):
             LOGGER.error(f"Error sending message to Twitch chat: {e}")
 
     async def send_youtube_message(self, message: str) -> None:
-        """Send a message to YouTube live chat."""
+        """Queue a message for YouTube live chat (sent by youtube_relay)."""
         if not YOUTUBE_VIDEO_ID:
             return
-        
-        try:
-            # Try to use google-api-python-client if available
-            try:
-                from googleapiclient.discovery import build
-                from google.auth.transport.requests import Request
-                import pickle
-                
-                # Get YouTube API credentials from environment
-                youtube_live_chat_id = os.environ.get("YOUTUBE_LIVE_CHAT_ID")
-                
-                if not youtube_live_chat_id:
-                    LOGGER.debug("YouTube live chat ID not configured, skipping YouTube message")
-                    return
-                
-                # OAuth2 flow for YouTube API
-                creds = None
-                token_file = 'youtube_token.pickle'
-                
-                # Load existing token if available
-                if os.path.exists(token_file):
-                    with open(token_file, 'rb') as token:
-                        creds = pickle.load(token)
-                
-                # If there are no (valid) credentials available, let the user log in
-                if not creds or not creds.valid:
-                    if creds and creds.expired and creds.refresh_token:
-                        creds.refresh(Request())
-                    else:
-                        # This would require user interaction, so we'll skip for now
-                        # In production, you'd want to handle OAuth flow properly
-                        LOGGER.warning("YouTube OAuth token not available or expired. Please authenticate first.")
-                        return
-                    
-                    # Save the credentials for the next run
-                    with open(token_file, 'wb') as token:
-                        pickle.dump(creds, token)
-                
-                # Build YouTube API service
-                youtube = build('youtube', 'v3', credentials=creds)
-                
-                # Send message to live chat
-                request = youtube.liveChatMessages().insert(
-                    part='snippet',
-                    body={
-                        'snippet': {
-                            'liveChatId': youtube_live_chat_id,
-                            'type': 'textMessageEvent',
-                            'textMessageDetails': {
-                                'messageText': message
-                            }
-                        }
-                    }
-                )
-                request.execute()
-                LOGGER.info(f"Sent message to YouTube chat: {message}")
-                
-            except ImportError:
-                # google-api-python-client not installed, use alternative method
-                LOGGER.debug("google-api-python-client not installed, using alternative method")
-                # Alternative: Use YouTube Data API v3 with direct HTTP requests
-                await self._send_youtube_message_http(message)
-            except Exception as e:
-                LOGGER.error(f"Error sending YouTube message via API: {e}")
-                # Fallback to HTTP method
-                await self._send_youtube_message_http(message)
-                
-        except Exception as e:
-            LOGGER.error(f"Error sending message to YouTube chat: {e}")
-
-    async def _send_youtube_message_http(self, message: str) -> None:
-        """Alternative method to send YouTube message using HTTP requests (requires OAuth token)."""
-        youtube_access_token = os.environ.get("YOUTUBE_ACCESS_TOKEN")
-        youtube_live_chat_id = os.environ.get("YOUTUBE_LIVE_CHAT_ID")
-        
-        if not youtube_access_token or not youtube_live_chat_id:
-            LOGGER.debug("YouTube access token or live chat ID not configured")
-            return
-        
-        try:
-            url = "https://www.googleapis.com/youtube/v3/liveChat/messages"
-            headers = {
-                "Authorization": f"Bearer {youtube_access_token}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "snippet": {
-                    "liveChatId": youtube_live_chat_id,
-                    "type": "textMessageEvent",
-                    "textMessageDetails": {
-                        "messageText": message
-                    }
-                }
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
-            if response.status_code == 200:
-                LOGGER.info(f"Sent message to YouTube chat: {message}")
-            else:
-                LOGGER.warning(f"Failed to send YouTube message: {response.status_code} - {response.text}")
-        except Exception as e:
-            LOGGER.error(f"Error sending YouTube message via HTTP: {e}")
+        youtube_relay.send(message)
 
 
 def start_bot() -> None:
     twitchio.utils.setup_logging(level=logging.INFO)
 
+    # Bring the schema up to date once, before anything touches the database
+    migrate(db)
+
     # Initialize links database on startup
     init_links_database()
 
+    # Load recent chat history and start the background writer
+    chat_store.start()
+
     async def runner() -> None:
         async with (
             asqlite.create_pool("tokens.db") as tdb,
             Bot(token_database=tdb) as bot,
         ):
             await bot.setup_database()
-            await bot.start()
+            try:
+                await bot.start()
+            finally:
+                # Don't leave completions running against a closed bot
+                ai_engine.cancel_all()
 
     try:
         asyncio.run(runner())
     except KeyboardInterrupt:
         LOGGER.warning("Shutting down due to KeyboardInterrupt...")
+    finally:
+        chat_store.stop()
@@ -0,0 +1,79 @@
+import asyncio
+
+import ai_cache
+from ai_cache import ResponseCache
+
+
+def test_entries_expire_after_their_kind_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ai_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttls={"lurk": 10.0})
+
+    cache.put("lurk", "Bob is lurking!", "enjoy the lurk")
+    cache.put("mention", "hi", "not cached")
+    assert cache.get("lurk", "bob is lurking") == "enjoy the lurk"  # Normalized key
+    assert cache.get("mention", "hi") is None
+
+    now[0] += 10.0
+    assert cache.get("lurk", "bob is lurking") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(ttls={"search": 60.0}, max_entries=2)
+    cache.put("search", "a", "1")
+    cache.put("search", "b", "2")
+    cache.get("search", "a")  # b is now the least recently used
+    cache.put("search", "c", "3")
+
+    assert cache.get("search", "b") is None
+    assert cache.get("search", "a") == "1"
+    assert cache.get("search", "c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_oversized_responses_are_skipped():
+    cache = ResponseCache(ttls={"search": 60.0}, max_bytes=10)
+    cache.put("search", "a", "xxxx")  # 5 bytes with the key
+    cache.put("search", "b", "yyyy")
+    cache.put("search", "c", "zzzz")
+    assert cache.get("search", "a") is None
+    assert cache.stats()["bytes"] == 10
+
+    cache.put("search", "d", "w" * 20)
+    assert cache.get("search", "d") is None
+    assert cache.get("search", "c") == "zzzz"
+
+
+def test_concurrent_requests_share_one_completion():
+    cache = ResponseCache(ttls={"raid": 60.0})
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "welcome raiders"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("raid", "raid from x", compute) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["welcome raiders"] * 3
+    assert len(calls) == 1
+    assert cache.stats()["kinds"]["raid"]["coalesced"] == 2
+    assert cache.get("raid", "raid from x") == "welcome raiders"
+
+
+def test_error_replies_are_not_cached():
+    cache = ResponseCache(ttls={"search": 60.0})
+    replies = iter(["Error: rate limited", None, "the answer"])
+
+    async def compute():
+        return next(replies)
+
+    async def ask():
+        return await cache.get_or_compute("search", "what is it", compute)
+
+    assert asyncio.run(ask()) == "Error: rate limited"
+    assert asyncio.run(ask()) is None
+    assert asyncio.run(ask()) == "the answer"
+    assert asyncio.run(ask()) == "the answer"  # Now served from the cache
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+
+from ai_backends import FakeBackend  # noqa: E402
+from sharkai import AIEngine  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hello there"}]
+
+
+def test_stream_frees_its_slot_while_the_caller_is_busy():
+    engine = AIEngine(FakeBackend(latency=0.01, tokens_per_second=1000), max_concurrency=1)
+
+    async def main():
+        running = []
+        async for _ in engine.stream(kind="mention", messages=MESSAGES):
+            await asyncio.sleep(0.05)  # e.g. sending the sentence to chat
+            running.append(engine.scheduler.stats()["classes"]["mention"]["running"])
+        return running
+
+    running = asyncio.run(main())
+    assert running[-1] == 0
+
+
+def test_cancel_all_does_not_cancel_the_caller():
+    engine = AIEngine(FakeBackend(latency=0.01, tokens_per_second=1000), max_concurrency=1)
+
+    async def main():
+        async def caller():
+            async for _ in engine.stream(kind="mention", messages=MESSAGES):
+                await asyncio.sleep(0.05)  # Between chunks, outside the request
+            return "finished"
+
+        task = asyncio.ensure_future(caller())
+        await asyncio.sleep(0.1)
+        engine.cancel_all()
+        return await task
+
+    assert asyncio.run(main()) == "finished"
+    assert engine.idle()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from ai_scheduler import AIScheduler, RequestExpired
+
+
+async def hold(scheduler, kind, order, release):
+    async with scheduler.slot(kind):
+        order.append(kind)
+        await release.wait()
+
+
+def test_freed_slots_go_to_the_highest_priority_waiter():
+    async def main():
+        scheduler = AIScheduler(max_concurrency=1)
+        order = []
+        releases = {kind: asyncio.Event() for kind in ("search", "lurk", "raid", "mention")}
+        tasks = []
+        for kind in releases:  # Arrive lowest priority first
+            tasks.append(asyncio.create_task(hold(scheduler, kind, order, releases[kind])))
+            await asyncio.sleep(0)
+        for kind in ("search", "mention", "raid", "lurk"):
+            releases[kind].set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["search", "mention", "raid", "lurk"]
+
+
+def test_a_class_at_its_cap_does_not_block_other_classes():
+    async def main():
+        scheduler = AIScheduler(max_concurrency=4)
+        order = []
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, kind, order, release)) for kind in ("lurk", "lurk", "mention")]
+        await asyncio.sleep(0.01)
+        running = list(order)
+        stats = scheduler.stats()["classes"]["lurk"]
+        release.set()
+        await asyncio.gather(*tasks)
+        return running, stats
+
+    running, lurk = asyncio.run(main())
+    assert running == ["lurk", "mention"]  # The second lurk waits for the first
+    assert (lurk["running"], lurk["queued"]) == (1, 1)
+
+
+def test_requests_still_queued_at_their_deadline_expire():
+    async def main():
+        scheduler = AIScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(scheduler, "mention", [], release))
+        await asyncio.sleep(0)
+        with pytest.raises(RequestExpired):
+            async with scheduler.slot("search", deadline=0.05):
+                pass
+        release.set()
+        await holder
+        async with scheduler.slot("search", deadline=0.05):
+            pass  # The expired waiter left no stale slot behind
+        return scheduler.stats()["classes"]["search"]
+
+    search = asyncio.run(main())
+    assert (search["expired"], search["started"], search["queued"], search["running"]) == (1, 1, 0, 0)
@@ -0,0 +1,55 @@
+import pytest
+
+from chat_store import ChatStore
+from database import ConnectionPool
+
+app_module = pytest.importorskip("app")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ChatStore(ConnectionPool(str(tmp_path / "messages.db")))
+    monkeypatch.setattr(app_module, "chat_store", store)
+    return store
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_matching_etag_gets_a_bare_304(store, client):
+    store.add("viewer", "hello")
+    first = client.get("/api/chat")
+    assert first.status_code == 200
+    assert first.headers["ETag"]
+
+    again = client.get("/api/chat", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_since_returns_newer_messages_and_the_cursor(store, client):
+    for i in range(3):
+        store.add("viewer", f"line {i}")
+    body = client.get("/api/chat").get_json()
+    assert body["cursor"] == 3
+    assert [m["id"] for m in body["messages"]] == [1, 2, 3]
+
+    store.add("viewer", "new")
+    body = client.get("/api/chat", query_string={"since": body["cursor"]}).get_json()
+    assert [m["message"] for m in body["messages"]] == ["new"]
+    assert body["cursor"] == 4
+
+
+@pytest.mark.parametrize("change", [lambda s: s.remove_user("troll"), lambda s: s.clear()])
+def test_etag_changes_after_a_purge_or_clear(store, client, change):
+    store.add("troll", "spam")
+    etag = client.get("/api/chat").headers["ETag"]
+
+    change(store)
+    response = client.get("/api/chat", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["messages"] == []
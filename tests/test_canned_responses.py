@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+
+from canned_responses import CannedResponsePool  # noqa: E402
+
+
+def test_kinds_with_unusable_templates_wait_for_the_next_persona():
+    persona = ["chatting"]
+    asked = []
+
+    async def generate(current, instruction):
+        asked.append(instruction)
+        if "{count}" in instruction:
+            return "thanks {user} for the subs!"  # Never uses {count}
+        return "thanks {user}!"
+
+    pool = CannedResponsePool(generate, lambda: persona[0], lambda: True, pool_size=5, max_rejected=3)
+    gift_requests = lambda: sum("{count}" in instruction for instruction in asked)  # noqa: E731
+
+    asyncio.run(pool._refill())
+    asyncio.run(pool._refill())
+    stats = pool.stats()
+    assert gift_requests() == 3
+    assert stats["rejected"] == 3
+    assert stats["paused"] == ["gift"]
+    assert stats["ready"] == {"follow": 5, "sub": 5, "gift": 0, "raid": 5}
+
+    persona[0] = "playing a game"
+    asyncio.run(pool._refill())
+    assert gift_requests() == 6
+    assert pool.take("follow", "bob") == "thanks bob!"
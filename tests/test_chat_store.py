@@ -0,0 +1,72 @@
+from chat_store import ChatStore
+from database import ConnectionPool
+from db_migrations import migrate
+
+
+def make_store(tmp_path, max_messages=50):
+    pool = ConnectionPool(str(tmp_path / "messages.db"))
+    migrate(pool)
+    return pool, ChatStore(pool, max_messages=max_messages)
+
+
+def persisted(pool):
+    with pool.connection() as conn:
+        return conn.execute("SELECT id, from_user, message FROM messages ORDER BY id").fetchall()
+
+
+def test_snapshot_returns_messages_after_the_cursor(tmp_path):
+    _, store = make_store(tmp_path, max_messages=3)
+    for i in range(5):
+        store.add("viewer", f"line {i}")
+
+    version, last_id, messages = store.snapshot()
+    assert last_id == 5
+    assert [m["id"] for m in messages] == [3, 4, 5]  # Only the ring buffer is kept
+
+    assert store.snapshot(since_id=4)[2] == messages[-1:]
+    assert store.snapshot(since_id=5)[2] == []
+    # A cursor from before a restart is ahead of the store: resynchronise
+    assert store.snapshot(since_id=99)[2] == messages
+    assert store.snapshot(limit=2)[2] == messages[-2:]
+
+    store.add("viewer", "one more")
+    assert store.snapshot()[0] > version
+
+
+def test_purge_and_clear_are_persisted_in_order(tmp_path):
+    pool, store = make_store(tmp_path)
+    store.start()
+    store.add("troll", "spam")
+    store.add("viewer", "hello")
+    assert store.remove_user("troll") == 1
+    store.add("troll", "back again")
+    store.clear()
+    store.add("viewer", "after the clear")
+    store.add("troll", "still here")
+    store.remove_user("troll")
+    store.stop()
+
+    assert [m["message"] for m in store.recent()] == ["after the clear"]
+    assert persisted(pool) == [(4, "viewer", "after the clear")]
+
+
+def test_ids_keep_increasing_across_the_startup_clear(tmp_path):
+    pool, store = make_store(tmp_path)
+    store.start()
+    for i in range(3):
+        store.add("viewer", f"line {i}")
+    store.stop()
+
+    # app.py empties the table on startup; sqlite_sequence is kept
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM messages;")
+        conn.commit()
+
+    restarted = ChatStore(pool)
+    restarted.start()
+    entry = restarted.add("viewer", "after restart")
+    restarted.stop()
+
+    assert entry["id"] == 4
+    assert restarted.snapshot(since_id=3)[2] == [entry]
+    assert persisted(pool) == [(4, "viewer", "after restart")]
@@ -0,0 +1,66 @@
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+def make_breaker(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return CircuitBreaker("test", failure_threshold=2, slow_threshold=4.0), now
+
+
+def trip(breaker):
+    assert breaker.allow()
+    breaker.record_failure("boom")
+
+
+def test_opens_after_consecutive_failures_then_probes(monkeypatch):
+    breaker, now = make_breaker(monkeypatch)
+    breaker.record_failure()
+    breaker.record_success(0.5)  # A success resets the count
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "closed"
+
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    assert not breaker.allow()
+
+    now[0] += 10.0
+    assert breaker.allow()  # The single half-open probe
+    assert breaker.stats()["state"] == "half-open"
+    assert not breaker.allow()
+
+    breaker.record_success(0.5)
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_failed_probes_back_off_on_the_schedule(monkeypatch):
+    breaker, now = make_breaker(monkeypatch)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    delays = []
+    for _ in range(5):
+        delays.append(breaker.stats()["retry_in"])
+        now[0] += delays[-1]
+        trip(breaker)  # Probe fails: open again for longer
+    assert delays == [10.0, 30.0, 60.0, 120.0, 120.0]
+
+    now[0] += 120.0
+    assert breaker.allow()
+    breaker.record_success(0.5)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.stats()["retry_in"] == 10.0  # Recovery resets the schedule
+
+
+def test_slow_first_chunks_count_as_failures(monkeypatch):
+    breaker, _ = make_breaker(monkeypatch)
+    breaker.record_success(4.5)
+    assert breaker.stats()["state"] == "closed"
+    breaker.record_success(6.0)
+
+    stats = breaker.stats()
+    assert stats["state"] == "open"
+    assert (stats["successes"], stats["failures"]) == (0, 2)
@@ -0,0 +1,26 @@
+import asyncio
+
+from event_aggregator import ChannelEvent, EventAggregator
+
+
+def test_batches_are_sent_and_their_tasks_finish():
+    batches = []
+
+    async def on_batch(batch):
+        batches.append(batch)
+        if len(batches) == 1:
+            raise RuntimeError("reply failed")  # Logged by the aggregator, not left on the task
+
+    async def main():
+        loop_errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: loop_errors.append(context))
+        aggregator = EventAggregator(on_batch, window=0.05, max_window=1.0, max_size=2)
+        for name in ("a", "b", "c"):
+            aggregator.add(ChannelEvent("follow", name))
+        await asyncio.sleep(0.2)
+        return asyncio.all_tasks() - {asyncio.current_task()}, loop_errors
+
+    unfinished, loop_errors = asyncio.run(main())
+    assert [[e.user for e in batch] for batch in batches] == [["a", "b"], ["c"]]
+    assert not unfinished
+    assert not loop_errors
@@ -0,0 +1,70 @@
+import struct
+
+import pytest
+
+from mp3_probe import mp3_duration
+
+# MPEG-1 layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+MPEG1_HEADER = b"\xff\xfb\x90\x00"
+MPEG1_FRAME = 417
+MPEG1_SECONDS = 1152 / 44100
+# MPEG-2 layer III, 48 kbps, 24 kHz, mono (edge-tts): 144-byte frames of 576 samples
+MPEG2_HEADER = b"\xff\xf3\x64\xc0"
+MPEG2_FRAME = 144
+MPEG2_SECONDS = 576 / 24000
+
+
+def frame(header: bytes, length: int, payload: bytes = b"", offset: int = 4) -> bytes:
+    body = bytearray(length)
+    body[:4] = header
+    body[offset:offset + len(payload)] = payload
+    return bytes(body)
+
+
+def xing(header: bytes, length: int, side_info: int, frames: int, size: int, tag: bytes = b"Xing") -> bytes:
+    return frame(header, length, tag + struct.pack(">III", 0x3, frames, size), 4 + side_info)
+
+
+def id3(size: int = 20) -> bytes:
+    return b"ID3\x04\x00\x00" + bytes([0, 0, 0, size]) + bytes(size)
+
+
+def test_cbr_frames_are_counted():
+    data = id3() + frame(MPEG1_HEADER, MPEG1_FRAME) * 10
+    assert mp3_duration(data) == pytest.approx(10 * MPEG1_SECONDS)
+
+
+@pytest.mark.parametrize("tag", [b"Xing", b"Info"])
+def test_xing_or_info_header_covering_the_file_is_trusted(tag):
+    audio = frame(MPEG1_HEADER, MPEG1_FRAME) * 2
+    # Claims 100 frames; only trusted because its byte count spans the file
+    data = id3() + xing(MPEG1_HEADER, MPEG1_FRAME, 32, 100, MPEG1_FRAME + len(audio), tag) + audio
+    assert mp3_duration(data) == pytest.approx(100 * MPEG1_SECONDS)
+
+
+def test_vbri_header_covering_the_file_is_trusted():
+    audio = frame(MPEG1_HEADER, MPEG1_FRAME) * 2
+    vbri = b"VBRI" + bytes(6) + struct.pack(">II", MPEG1_FRAME + len(audio), 50)
+    data = frame(MPEG1_HEADER, MPEG1_FRAME, vbri, 36) + audio
+    assert mp3_duration(data) == pytest.approx(50 * MPEG1_SECONDS)
+
+
+def test_concatenated_segments_are_walked_frame_by_frame():
+    def segment(frames: int) -> bytes:
+        audio = frame(MPEG2_HEADER, MPEG2_FRAME) * frames
+        # Each segment's Xing header only describes that segment
+        return id3() + xing(MPEG2_HEADER, MPEG2_FRAME, 9, frames, MPEG2_FRAME + len(audio)) + audio
+
+    data = segment(30) + segment(12) + b"TAG" + bytes(125)
+    assert mp3_duration(data) == pytest.approx(42 * MPEG2_SECONDS)
+
+
+def test_garbage_between_frames_is_skipped():
+    audio = frame(MPEG2_HEADER, MPEG2_FRAME)
+    data = audio * 3 + b"\x00\xff\x00junk" + audio * 2
+    assert mp3_duration(data) == pytest.approx(5 * MPEG2_SECONDS)
+
+
+def test_no_frames():
+    assert mp3_duration(b"") is None
+    assert mp3_duration(id3() + b"not audio") is None
@@ -0,0 +1,56 @@
+import asyncio
+import shutil
+
+import pytest
+
+pytest.importorskip("edge_tts")
+pytest.importorskip("gtts")
+pytest.importorskip("dotenv")
+
+from tts_backends import LocalTTSBackend  # noqa: E402
+
+
+def test_espeak_text_starting_with_dash_is_not_parsed_as_options(monkeypatch, tmp_path):
+    text = f"-w {tmp_path / 'injected.wav'} hello"
+    calls = []
+
+    class FakeStdin:
+        def __init__(self):
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+        async def drain(self):
+            pass
+
+        def close(self):
+            pass
+
+    class FakeStdout:
+        async def read(self, size):
+            return b""
+
+    class FakeProcess:
+        stdin = FakeStdin()
+        stdout = FakeStdout()
+        returncode = 0
+
+        async def wait(self):
+            return 0
+
+    async def fake_exec(*args, **kwargs):
+        calls.append(args)
+        return FakeProcess()
+
+    monkeypatch.setattr(shutil, "which", lambda name: "/usr/bin/" + name)
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+
+    async def collect():
+        return [chunk async for chunk in LocalTTSBackend("espeak").stream(text)]
+
+    asyncio.run(collect())
+    (args,) = calls
+    assert text not in args
+    assert "--stdin" in args
+    assert FakeProcess.stdin.data == text.encode()
@@ -0,0 +1,28 @@
+import os
+import threading
+
+from tts_cache import TTSCache, cache_key
+
+
+def test_clips_are_stored_with_the_extension_of_their_mimetype(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    key = cache_key("hello", "local:espeak")
+    cache.put(key, b"RIFF....WAVE", "audio/wav")
+
+    assert os.listdir(tmp_path) == [key + ".wav"]
+    assert cache.get(key, "audio/wav") == b"RIFF....WAVE"
+    assert cache.get(key, "audio/mpeg") is None
+    assert TTSCache(str(tmp_path)).get(key, "audio/wav") == b"RIFF....WAVE"  # Reloaded from disk
+
+
+def test_concurrent_puts_of_the_same_clip_do_not_collide(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    key = cache_key("hello")
+    threads = [threading.Thread(target=cache.put, args=(key, b"\xff\xfb" * 50000)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert os.listdir(tmp_path) == [key + ".mp3"]
+    assert cache.get(key) == b"\xff\xfb" * 50000
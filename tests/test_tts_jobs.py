@@ -0,0 +1,56 @@
+import asyncio
+
+from pubsub import Broadcaster
+from tts_jobs import TTSJobQueue
+from tts_stream import PlaybackQueue, UtteranceRegistry
+
+
+def test_backlog_waits_in_job_queue_when_playback_never_acks():
+    events = Broadcaster()
+    playback = PlaybackQueue(events, ack_timeout=60)  # No overlay: nothing is ever acked
+    streams = UtteranceRegistry()
+    jobs = TTSJobQueue(events, playback=playback, max_depth=8, speedup_backlog=3)
+
+    async def speak(text, rate):
+        stream = streams.create(text)
+        playback.enqueue(stream)
+        stream.finish()
+        return stream, 8.0
+
+    async def main():
+        worker = jobs.start(speak)
+        for i in range(40):
+            jobs.submit(f"alert {i}: " + "x" * 140)
+        await asyncio.sleep(0.5)
+        worker.cancel()
+
+    asyncio.run(main())
+    stats = jobs.stats()
+    assert playback.pending() <= 1
+    assert stats["depth"] <= 8
+    assert stats["dropped"] >= 30
+    assert stats["sped_up"] >= 1
+
+
+def test_manual_jobs_are_never_merged_or_sped_up():
+    events = Broadcaster()
+    playback = PlaybackQueue(events, ack_timeout=60)
+    streams = UtteranceRegistry()
+    jobs = TTSJobQueue(events, playback=playback, playback_ahead=100, speedup_backlog=1)
+    spoken = []
+
+    async def speak(text, rate):
+        spoken.append((text, rate))
+        stream = streams.create(text)
+        stream.finish()
+        return stream, 1.0
+
+    async def main():
+        worker = jobs.start(speak)
+        for text, source in [("hi", "bot"), ("typed", "manual"), ("yo", "bot"), ("sup", "bot")]:
+            jobs.submit(text, source=source)
+        await asyncio.sleep(0.2)
+        worker.cancel()
+
+    asyncio.run(main())
+    assert spoken == [("hi", 1.25), ("typed", 1.0), ("yo sup", 1.0)]
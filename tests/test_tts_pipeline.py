@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("edge_tts")
+pytest.importorskip("gtts")
+pytest.importorskip("dotenv")
+
+import tts_pipeline  # noqa: E402
+from tts_cache import TTSCache  # noqa: E402
+from tts_pipeline import TTSPipeline  # noqa: E402
+
+
+class StallingBackend:
+    name = "stalling"
+    mimetype = "audio/mpeg"
+    segmented = False
+    variable_rate = False
+    voice = "stall"
+    lang = ""
+    tld = ""
+
+    async def stream(self, text, rate=1.0):
+        yield b"\xff\xfb\x90\x00"
+        await asyncio.sleep(60)  # Never sends the rest
+        yield b""
+
+    @staticmethod
+    def duration(data):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def fast_timeouts(monkeypatch, tmp_path):
+    monkeypatch.setattr(tts_pipeline, "tts_cache", TTSCache(str(tmp_path)))
+    monkeypatch.setattr(tts_pipeline, "TTS_STALL_TIMEOUT", 0.3)
+
+
+def test_stall_after_first_chunk_times_out_and_counts_as_failure():
+    pipeline = TTSPipeline(StallingBackend(), fallback=None)
+
+    async def speak():
+        return await asyncio.wait_for(pipeline.speak("hello there"), timeout=5)
+
+    with pytest.raises(asyncio.TimeoutError, match="stalled"):
+        asyncio.run(speak())
+    assert pipeline.breaker.stats()["failures"] == 1
+
+
+def test_cancelled_half_open_probe_reopens_the_breaker():
+    pipeline = TTSPipeline(StallingBackend(), fallback=None)
+    pipeline.breaker._state = "half-open"
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(pipeline.speak("hello there"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert pipeline.breaker.stats()["state"] == "open"
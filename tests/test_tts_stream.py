@@ -0,0 +1,37 @@
+import time
+
+from pubsub import Broadcaster
+from tts_stream import AudioStream, PlaybackQueue, UtteranceRegistry
+
+
+def test_queued_clips_are_not_evicted_until_played():
+    registry = UtteranceRegistry(max_tracked=2)
+    playback = PlaybackQueue(Broadcaster(), registry, ack_timeout=60)
+    streams = [registry.create(f"line {i}") for i in range(6)]
+    for stream in streams:
+        playback.enqueue(stream)
+
+    assert all(registry.get(stream.id) is stream for stream in streams)
+
+    for stream in streams:
+        assert playback.ack(stream.id)
+    # Played, so no longer pinned: back down to the two most recent
+    assert [registry.get(stream.id) for stream in streams] == [None] * 4 + streams[4:]
+
+
+def test_durations_of_queued_clips_are_used_once_they_play():
+    playback = PlaybackQueue(Broadcaster(), ack_timeout=3, grace=0.05)
+    first = AudioStream("first", "one")
+    second = AudioStream("second", "two")
+    playback.enqueue(first)
+    playback.enqueue(second)
+    # Both lengths arrive while the first clip plays; nobody acks
+    playback.set_duration(first.id, 0.1)
+    playback.set_duration(second.id, 0.1)
+
+    started = time.monotonic()
+    while playback.current() is not None and time.monotonic() - started < 5:
+        time.sleep(0.02)
+
+    assert playback.current() is None
+    assert time.monotonic() - started < 1
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from youtube_relay import YouTubeRelay  # noqa: E402
+
+
+def test_failed_sends_use_no_quota(monkeypatch):
+    monkeypatch.setenv("YOUTUBE_ACCESS_TOKEN", "token")
+    relay = YouTubeRelay(live_chat_id="chat", burst=3, interval=0.0)
+
+    def fail(message):
+        raise RuntimeError("403 forbidden")
+
+    relay._send_blocking = fail
+
+    async def main():
+        worker = asyncio.ensure_future(relay.run())
+        await asyncio.sleep(0)
+        for i in range(3):
+            relay.send(f"line {i}")
+            await asyncio.sleep(0.05)
+        worker.cancel()
+
+    asyncio.run(main())
+    stats = relay.stats()
+    assert stats["failed"] == 3
+    assert stats["quota_used"] == 0
+    assert stats["tokens"] == 3
+
+
+def test_relay_is_disabled_without_credentials(monkeypatch, tmp_path):
+    monkeypatch.delenv("YOUTUBE_ACCESS_TOKEN", raising=False)
+    relay = YouTubeRelay(live_chat_id="chat", token_file=str(tmp_path / "missing.pickle"))
+
+    asyncio.run(asyncio.wait_for(relay.run(), timeout=1))  # Returns instead of serving forever
+    relay.send("hello")
+    assert relay.stats()["queued"] == 0
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import edge_tts
+from dotenv import load_dotenv
+from gtts import gTTS
+
+from mp3_probe import mp3_duration
+
+try:
+    import pyttsx3
+except ImportError:
+    pyttsx3 = None
+
+load_dotenv()
+
+LOGGER = logging.getLogger("TTSBackends")
+
+# Configuration
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "edge")  # "edge" or "gtts"
+TTS_VOICE = os.environ.get("TTS_VOICE", "en-AU-NatashaNeural")  # edge-tts voice (see get_voices.py)
+TTS_LANG = os.environ.get("TTS_LANG", "en")  # gTTS language code, e.g. 'en', 'en-uk', 'en-au'
+TTS_TLD = os.environ.get("TTS_TLD", "us")  # gTTS accent via Google domain, e.g. 'us', 'co.uk', 'com.au'
+TTS_FALLBACK = os.environ.get("TTS_FALLBACK", "auto")  # Offline engine: "auto", "espeak", "pyttsx3" or "none"
+VOICE_CATALOG_FILE = os.environ.get("VOICE_CATALOG_FILE", "voice_catalog.json")
+VOICE_CATALOG_MAX_AGE = 7 * 24 * 3600  # Seconds before the cached catalog is fetched again
+ESPEAK_WORDS_PER_MINUTE = 175  # espeak's default speed, scaled by the requested rate
+
+
+class EdgeTTSBackend:
+    """Microsoft Edge neural voices via edge-tts, natively async.
+
+    Audio chunks are yielded as the service sends them, with no thread
+    hop and none of gTTS's per-request rate limiting.
+    """
+
+    name = "edge"
+    mimetype = "audio/mpeg"
+    segmented = True  # MP3 segments concatenate cleanly
+    variable_rate = True
+
+    def __init__(self, voice: str = TTS_VOICE):
+        self.voice = voice
+        self.lang = ""
+        self.tld = ""
+
+    async def stream(self, text: str, rate: float = 1.0):
+        communicate = edge_tts.Communicate(text, self.voice, rate=f"{round((rate - 1) * 100):+d}%")
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio" and chunk["data"]:
+                yield chunk["data"]
+
+    @staticmethod
+    def duration(data: bytes) -> float | None:
+        return mp3_duration(data)
+
+
+class GTTSBackend:
+    """Google Translate TTS via gTTS. Blocking, so it runs on worker threads.
+
+    gTTS has no speech rate setting, so `rate` is ignored.
+    """
+
+    name = "gtts"
+    mimetype = "audio/mpeg"
+    segmented = True
+    variable_rate = False
+
+    def __init__(self, lang: str = TTS_LANG, tld: str = TTS_TLD, max_workers: int = 4):
+        self.voice = ""
+        self.lang = lang
+        self.tld = tld
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gtts")
+
+    async def stream(self, text: str, rate: float = 1.0):
+        loop = asyncio.get_running_loop()
+        chunks = gTTS(text=text, lang=self.lang, slow=False, tld=self.tld).stream()
+        done = object()
+        while True:
+            chunk = await loop.run_in_executor(self._executor, next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    @staticmethod
+    def duration(data: bytes) -> float | None:
+        return mp3_duration(data)
+
+
+class LocalTTSBackend:
+    """Offline fallback engine: espeak-ng/espeak, or pyttsx3 (SAPI on Windows).
+
+    Robotic, but needs no network, so speech keeps working while the cloud
+    backend is down. Produces WAV, one file per utterance.
+    """
+
+    name = "local"
+    mimetype = "audio/wav"
+    segmented = False  # WAV files can't simply be concatenated
+    variable_rate = True
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.voice = f"local:{engine}"
+        self.lang = ""
+        self.tld = ""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-tts")
+
+    async def stream(self, text: str, rate: float = 1.0):
+        if self.engine == "pyttsx3":
+            yield await asyncio.get_running_loop().run_in_executor(self._executor, self._pyttsx3_wav, text, rate)
+            return
+
+        # Text goes in on stdin: on the command line, a leading "-" would be read as options
+        process = await asyncio.create_subprocess_exec(
+            shutil.which("espeak-ng") or shutil.which("espeak"),
+            "-s", str(round(ESPEAK_WORDS_PER_MINUTE * rate)), "--stdout", "--stdin",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            process.stdin.write(text.encode())
+            await process.stdin.drain()
+            process.stdin.close()
+            while chunk := await process.stdout.read(65536):
+                yield chunk
+        finally:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+        if process.returncode:
+            raise RuntimeError(f"espeak exited with status {process.returncode}")
+
+    @staticmethod
+    def _pyttsx3_wav(text: str, rate: float) -> bytes:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            engine = pyttsx3.init()
+            if rate != 1.0:
+                engine.setProperty("rate", engine.getProperty("rate") * rate)
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def duration(data: bytes) -> float | None:
+        # espeak streams a header with a placeholder length, so measure the data itself
+        fmt = data.find(b"fmt ", 12, 64)
+        pcm = data.find(b"data", 12, 256)
+        if fmt < 0 or pcm < 0:
+            return None
+        byte_rate = struct.unpack_from("<I", data, fmt + 16)[0]
+        return (len(data) - pcm - 8) / byte_rate if byte_rate else None
+
+
+def create_fallback_backend(kind: str = TTS_FALLBACK):
+    """The offline engine selected by TTS_FALLBACK, or None if there is none."""
+    has_espeak = bool(shutil.which("espeak-ng") or shutil.which("espeak"))
+    if kind == "auto":
+        kind = "espeak" if has_espeak else "pyttsx3" if pyttsx3 is not None else "none"
+    if kind == "none":
+        return None
+    if kind == "espeak" and not has_espeak:
+        LOGGER.warning("TTS_FALLBACK=espeak but espeak-ng/espeak is not installed; no offline fallback")
+        return None
+    if kind == "pyttsx3" and pyttsx3 is None:
+        LOGGER.warning("TTS_FALLBACK=pyttsx3 but pyttsx3 is not installed; no offline fallback")
+        return None
+    if kind not in ("espeak", "pyttsx3"):
+        raise ValueError(f"Unknown TTS_FALLBACK: {kind!r} (expected auto, espeak, pyttsx3 or none)")
+    return LocalTTSBackend(kind)
+
+
+def create_tts_backend(kind: str = TTS_BACKEND):
+    """The backend selected by TTS_BACKEND."""
+    if kind == "edge":
+        return EdgeTTSBackend()
+    if kind == "gtts":
+        return GTTSBackend()
+    raise ValueError(f"Unknown TTS_BACKEND: {kind!r} (expected edge or gtts)")
+
+
+async def list_voices(refresh: bool = False) -> list[dict]:
+    """The edge-tts voice catalog, from the on-disk copy while it is fresh."""
+    if not refresh:
+        try:
+            if time.time() - os.path.getmtime(VOICE_CATALOG_FILE) < VOICE_CATALOG_MAX_AGE:
+                with open(VOICE_CATALOG_FILE, encoding="utf-8") as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass  # Missing or unreadable; fetch it
+
+    voices = await edge_tts.list_voices()
+    try:
+        with open(VOICE_CATALOG_FILE + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(voices, f)
+        os.replace(VOICE_CATALOG_FILE + ".tmp", VOICE_CATALOG_FILE)
+    except OSError as e:
+        LOGGER.warning(f"Could not cache voice catalog: {e}")
+    return voices
+
+
+async def check_voice(backend) -> None:
+    """Warn at startup if the configured edge-tts voice doesn't exist."""
+    if backend.name != "edge":
+        return
+    try:
+        voices = await list_voices()
+    except Exception as e:
+        LOGGER.warning(f"Could not load the edge-tts voice catalog: {e}")
+        return
+    if not any(v.get("ShortName") == backend.voice for v in voices):
+        LOGGER.warning(f"TTS_VOICE {backend.voice!r} is not in the edge-tts voice catalog; run get_voices.py to list voices")
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+LOGGER = logging.getLogger("TTSCache")
+
+# Configuration
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "50")) * 1024 * 1024
+
+# Constants
+EXTENSIONS = {"audio/mpeg": ".mp3", "audio/wav": ".wav"}  # Clips of other types aren't cached
+
+
+def cache_key(text: str, voice: str = "", lang: str = "", tld: str = "", rate: float = 1.0) -> str:
+    """Content address of a clip: the same words in the same voice share a file."""
+    parts = (text.strip(), voice, lang, tld) + ((f"{rate:g}",) if rate != 1.0 else ())
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class TTSCache:
+    """Size-bounded LRU cache of synthesized audio on disk.
+
+    Clips are stored as <key>.mp3 or <key>.wav under `directory`, by
+    mimetype. An in-memory index of file name -> size, rebuilt from the
+    directory on startup, keeps lookups and eviction off the filesystem;
+    the least recently used clips are deleted once the total exceeds
+    `max_bytes`.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, key: str, mimetype: str = "audio/mpeg") -> bytes | None:
+        self._load()
+        name = key + EXTENSIONS.get(mimetype, "")
+        with self._lock:
+            if name not in self._index:
+                self._counters["misses"] += 1
+                return None
+            self._index.move_to_end(name)
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._forget(name)
+                self._counters["misses"] += 1
+            return None
+        try:
+            os.utime(self._path(name))  # Keeps LRU order across restarts
+        except OSError:
+            pass
+        with self._lock:
+            self._counters["hits"] += 1
+        return data
+
+    def put(self, key: str, data: bytes, mimetype: str = "audio/mpeg") -> None:
+        if not data or len(data) > self._max_bytes or mimetype not in EXTENSIONS:
+            return
+        self._load()
+        name = key + EXTENSIONS[mimetype]
+        tmp_path = None
+        try:
+            # Write to a unique temp file then rename, so readers never see a
+            # partial clip and concurrent puts of the same clip don't collide
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self._directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(name))
+        except OSError as e:
+            LOGGER.warning(f"Could not cache TTS clip: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        evicted = []
+        with self._lock:
+            self._forget(name)
+            self._index[name] = len(data)
+            self._bytes += len(data)
+            self._counters["stores"] += 1
+            while self._bytes > self._max_bytes and len(self._index) > 1:
+                old_name = next(iter(self._index))
+                self._forget(old_name)
+                self._counters["evictions"] += 1
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(self._path(old_name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        self._load()
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return dict(
+                self._counters,
+                entries=len(self._index),
+                bytes=self._bytes,
+                max_bytes=self._max_bytes,
+                hit_rate=self._counters["hits"] / lookups if lookups else 0.0,
+            )
+
+    def _load(self) -> None:
+        """Index clips already on disk, oldest access first (once)."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            os.makedirs(self._directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self._directory):
+                if os.path.splitext(name)[1] not in EXTENSIONS.values():
+                    continue  # Including leftover .tmp files
+                try:
+                    stat = os.stat(os.path.join(self._directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._index[name] = size
+                self._bytes += size
+        if entries:
+            LOGGER.info(f"Loaded {len(entries)} cached TTS clips ({self._bytes / 1024 / 1024:.1f} MB)")
+
+    def _forget(self, name: str) -> None:
+        size = self._index.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._directory, name)
+
+
+tts_cache = TTSCache()
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from metrics import percentile
+from tts_stream import playback, tts_events
+
+LOGGER = logging.getLogger("TTSJobs")
+
+# Configuration
+TTS_QUEUE_MAX = int(os.environ.get("TTS_QUEUE_MAX", "8"))  # Queued jobs; the oldest is dropped beyond this
+TTS_JOB_MAX_AGE = float(os.environ.get("TTS_JOB_MAX_AGE", "90"))  # Seconds before a queued bot line is skipped
+TTS_COALESCE_CHARS = int(os.environ.get("TTS_COALESCE_CHARS", "200"))  # Adjacent jobs merged up to this length
+TTS_SPEEDUP_BACKLOG = int(os.environ.get("TTS_SPEEDUP_BACKLOG", "3"))  # Jobs still waiting that trigger faster speech
+TTS_SPEEDUP_RATE = float(os.environ.get("TTS_SPEEDUP_RATE", "1.25"))  # Speech rate multiplier while backlogged
+TTS_PLAYBACK_AHEAD = int(os.environ.get("TTS_PLAYBACK_AHEAD", "1"))  # Clips synthesized ahead of the one playing
+
+# Constants
+MAX_TRACKED_JOBS = 100  # Finished jobs kept around for status polling
+WAIT_SAMPLES = 200  # Recent queue wait times kept for the metrics
+PLAYBACK_POLL_INTERVAL = 0.1  # Seconds between checks while the playback queue is full
+
+
+class TTSJobQueue:
+    """The bot's TTS request queue, fed from the bot and from Flask threads.
+
+    Jobs are synthesized one at a time, in order, on the bot's event loop
+    by the `speak` coroutine given to start(). submit() can be called from
+    any thread and returns at once; status changes are published as "job"
+    events on tts_events and can be polled with get().
+
+    The queue is bounded so a busy stream can't build up minutes of
+    backlog: beyond `max_depth` the oldest queued job is dropped, jobs
+    still waiting after their deadline are skipped, adjacent short jobs
+    from the same source are spoken as one utterance, and while
+    `speedup_backlog` or more jobs are waiting the next one is spoken at
+    `speedup_rate`. Manual jobs (the TTS page) are never merged or sped
+    up, since the page previews them. A job is only taken once fewer
+    than `playback_ahead` clips are waiting to play, so lines wait here,
+    where those limits apply, rather than in the playback queue while
+    the overlay works through earlier clips.
+    """
+
+    def __init__(
+        self,
+        events=tts_events,
+        playback=playback,
+        playback_ahead: int = TTS_PLAYBACK_AHEAD,
+        max_depth: int = TTS_QUEUE_MAX,
+        coalesce_chars: int = TTS_COALESCE_CHARS,
+        speedup_backlog: int = TTS_SPEEDUP_BACKLOG,
+        speedup_rate: float = TTS_SPEEDUP_RATE,
+        max_tracked: int = MAX_TRACKED_JOBS,
+    ):
+        self._events = events
+        self._playback = playback
+        self._playback_ahead = playback_ahead
+        self._max_depth = max_depth
+        self._coalesce_chars = coalesce_chars
+        self._speedup_backlog = speedup_backlog
+        self._speedup_rate = speedup_rate
+        self._max_tracked = max_tracked
+        self._jobs = OrderedDict()
+        self._queue = deque()  # Ids of queued jobs, oldest first
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {
+            "submitted": 0, "spoken": 0, "failed": 0, "dropped": 0,
+            "expired": 0, "coalesced": 0, "sped_up": 0,
+        }
+
+    def start(self, speak) -> asyncio.Task:
+        """Start processing jobs with `speak(text, rate) -> (stream, duration)`.
+
+        Must be called from the bot's event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        return asyncio.create_task(self._run(speak))
+
+    def submit(self, text: str, source: str = "bot", max_age: float | None = TTS_JOB_MAX_AGE) -> dict:
+        """Queue `text` for synthesis and return the new job (thread-safe).
+
+        The job is skipped if it is still queued `max_age` seconds from now
+        (None: never).
+        """
+        if self._loop is None:
+            raise RuntimeError("TTS queue not running (the bot has not started)")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "text": text,
+            "source": source,
+            "status": "queued",
+            "created": now,
+            "deadline": now + max_age if max_age is not None else None,
+            "utterance_id": None,
+            "url": None,
+            "duration": None,
+            "rate": None,
+            "error": None,
+        }
+        dropped = None
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._jobs[job["id"]] = job
+            self._queue.append(job["id"])
+            if len(self._queue) > self._max_depth:
+                dropped = self._queue.popleft()
+                self._counters["dropped"] += 1
+            while len(self._jobs) > self._max_tracked:
+                self._jobs.popitem(last=False)
+        if dropped is not None:
+            LOGGER.warning(f"TTS queue full ({self._max_depth}), dropping the oldest job {dropped}")
+            self._update(dropped, status="dropped")
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        LOGGER.debug(f"TTS job {job['id']} queued from {source}")
+        return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self) -> dict:
+        """Queue depth, recent wait times and what the backpressure has done."""
+        now = time.time()
+        with self._lock:
+            waits = sorted(self._waits)
+            oldest = self._jobs.get(self._queue[0]) if self._queue else None
+            return dict(
+                self._counters,
+                depth=len(self._queue),
+                max_depth=self._max_depth,
+                playback_pending=self._playback.pending(),
+                oldest_wait=now - oldest["created"] if oldest else 0.0,
+                wait_p50=percentile(waits, 0.50),
+                wait_p95=percentile(waits, 0.95),
+                wait_max=waits[-1] if waits else 0.0,
+            )
+
+    def _update(self, job_id: str, **changes) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None  # No longer tracked
+            job.update(changes)
+            job = dict(job)
+        self._events.publish("job", job)
+        return job
+
+    def _next_batch(self) -> tuple[list[dict], int]:
+        """Take the next live job plus any short ones right behind it.
+
+        Returns (jobs, number still queued); expired jobs are skipped.
+        """
+        now = time.time()
+        batch = []
+        expired = []
+        with self._lock:
+            length = 0
+            while self._queue:
+                job = self._jobs.get(self._queue[0])
+                if job is None:
+                    self._queue.popleft()  # Evicted from tracking; nothing left to speak
+                    continue
+                if job["deadline"] is not None and now > job["deadline"]:
+                    self._queue.popleft()
+                    self._counters["expired"] += 1
+                    expired.append(job["id"])
+                    continue
+                if batch and (
+                    job["source"] != batch[0]["source"]
+                    or job["source"] == "manual"  # Previewed on the TTS page; must stay as typed
+                    or length + 1 + len(job["text"]) > self._coalesce_chars
+                ):
+                    break
+                self._queue.popleft()
+                self._waits.append(now - job["created"])
+                batch.append(dict(job))
+                length += len(job["text"]) + (1 if length else 0)
+            self._counters["coalesced"] += max(0, len(batch) - 1)
+            remaining = len(self._queue)
+        for job_id in expired:
+            self._update(job_id, status="expired")
+        if expired:
+            LOGGER.info(f"Skipped {len(expired)} stale TTS job(s)")
+        return batch, remaining
+
+    async def _run(self, speak) -> None:
+        while True:
+            # Hold jobs back until the overlay has caught up
+            while self._playback.pending() >= self._playback_ahead:
+                await asyncio.sleep(PLAYBACK_POLL_INTERVAL)
+            batch, remaining = self._next_batch()
+            if not batch:
+                self._wakeup.clear()
+                if not self.pending():
+                    await self._wakeup.wait()
+                continue
+
+            rate = 1.0
+            if remaining >= self._speedup_backlog and batch[0]["source"] != "manual":
+                rate = self._speedup_rate
+                with self._lock:
+                    self._counters["sped_up"] += 1
+            for job in batch:
+                self._update(job["id"], status="synthesizing", rate=rate)
+            text = " ".join(job["text"] for job in batch)
+            try:
+                stream, duration = await speak(text, rate)
+            except Exception as e:
+                LOGGER.error(f"TTS job {batch[0]['id']} failed: {e}", exc_info=True)
+                with self._lock:
+                    self._counters["failed"] += len(batch)
+                for job in batch:
+                    self._update(job["id"], status="failed", error=str(e))
+                continue
+            with self._lock:
+                self._counters["spoken"] += len(batch)
+            for job in batch:
+                self._update(job["id"], status="done", utterance_id=stream.id, url=stream.url, duration=duration)
+
+
+tts_jobs = TTSJobQueue()
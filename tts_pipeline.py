@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import time
+
+from circuit_breaker import CircuitBreaker
+from sentences import split_sentences
+from tts_backends import create_fallback_backend, create_tts_backend
+from tts_cache import cache_key, tts_cache
+from tts_stream import playback, utterances
+
+LOGGER = logging.getLogger("TTSPipeline")
+
+# Configuration
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))  # Segments synthesized at once
+TTS_MIN_SEGMENT_LENGTH = 40  # Shorter sentences are merged with the next one
+TTS_HEDGE_DELAY = float(os.environ.get("TTS_HEDGE_DELAY", "1.5"))  # No audio by then: start the fallback too
+TTS_PRIMARY_TIMEOUT = float(os.environ.get("TTS_PRIMARY_TIMEOUT", "6"))  # No audio by then: use the fallback
+TTS_STALL_TIMEOUT = float(os.environ.get("TTS_STALL_TIMEOUT", "10"))  # No new audio for this long mid-clip: give up
+TTS_BREAKER_SLOW = float(os.environ.get("TTS_BREAKER_SLOW", "3"))  # Seconds to first audio that count as a failure
+TTS_BREAKER_FAILURES = int(os.environ.get("TTS_BREAKER_FAILURES", "2"))  # Consecutive failures that open the breaker
+TTS_BREAKER_SCHEDULE = tuple(
+    float(delay) for delay in os.environ.get("TTS_BREAKER_SCHEDULE", "10,30,60,120").split(",")
+)  # Seconds open before each successive half-open probe
+_POLL_INTERVAL = 0.05
+
+
+class TTSPipeline:
+    """Turns text into a queued utterance, as fast as the backends allow.
+
+    Segments are requested from the TTS backend (see tts_backends.py)
+    concurrently, at most `max_workers` at once, and written to the
+    utterance's AudioStream in order, so a long reply is ready after about
+    the slowest segment rather than the sum of all of them. The first
+    segment is streamed chunk by chunk as it arrives; later ones are
+    buffered until everything before them has been written. MP3 frames
+    concatenate cleanly, so the result plays as one clip. Segments are
+    cached on disk (tts_cache.py), so repeated lines cost nothing.
+
+    A circuit breaker tracks the primary backend. While it is open,
+    utterances go straight to the offline fallback engine. While it is
+    closed, an utterance with no audio after TTS_HEDGE_DELAY also starts
+    on the fallback, and the fallback clip replaces it in the playback
+    queue if the primary fails or still has nothing after
+    TTS_PRIMARY_TIMEOUT. Either way, no clip holds the queue up for long.
+    """
+
+    def __init__(self, backend=None, fallback=None, max_workers: int = TTS_WORKERS):
+        self.backend = backend or create_tts_backend()
+        self.fallback = fallback if fallback is not None else create_fallback_backend()
+        self.breaker = CircuitBreaker(
+            f"tts:{self.backend.name}",
+            failure_threshold=TTS_BREAKER_FAILURES,
+            slow_threshold=TTS_BREAKER_SLOW,
+            schedule=TTS_BREAKER_SCHEDULE,
+        )
+        self._max_workers = max_workers
+        self._semaphores = {}  # Per backend, so a stalled primary can't block the fallback
+        self._counters = {"primary": 0, "fallback": 0, "hedged": 0, "failed_over": 0}
+
+    async def speak(self, text: str, rate: float = 1.0):
+        """Synthesize `text` into a new utterance queued for playback.
+
+        `rate` speeds speech up (>1) where the backend supports it.
+
+        Returns (stream, duration in seconds or None). The stream is the
+        one that ends up being played, which may be a fallback replacement.
+        """
+        if self.fallback is not None and not self.breaker.allow():
+            self._counters["fallback"] += 1
+            return await self._speak_with(self.fallback, text, rate)
+        if self.fallback is None:
+            self.breaker.allow()  # Nothing to fall back to, but keep tracking health
+        return await self._speak_hedged(text, rate)
+
+    def stats(self) -> dict:
+        return dict(
+            self._counters,
+            backend=self.backend.name,
+            fallback_voice=self.fallback.voice if self.fallback else None,
+            breaker=self.breaker.stats(),
+        )
+
+    async def _speak_with(self, backend, text: str, rate: float):
+        stream = utterances.create(text, backend.mimetype)
+        playback.enqueue(stream)
+        try:
+            await self._synthesize(backend, text, stream, rate)
+        except BaseException as e:
+            stream.finish(e)
+            playback.ack(stream.id)  # Nothing more to play; don't hold up the queue
+            raise
+        stream.finish()
+        return stream, backend.duration(stream.data())
+
+    async def _speak_hedged(self, text: str, rate: float):
+        self._counters["primary"] += 1
+        stream = utterances.create(text, self.backend.mimetype)
+        playback.enqueue(stream)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._synthesize(self.backend, text, stream, rate))
+        hedge = None
+        hedge_stream = None
+        failed_over = False
+        timed_out = None  # Why we cancelled the primary, if we did
+        first_audio = None
+        try:
+            # Wait for the primary's first audio; once some is out we are committed to it
+            while not primary.done():
+                elapsed = time.monotonic() - started
+                if stream.size > 0:
+                    first_audio = elapsed
+                    break
+                if hedge is None and self.fallback is not None and elapsed >= TTS_HEDGE_DELAY:
+                    self._counters["hedged"] += 1
+                    hedge_stream = utterances.create(text, self.fallback.mimetype)
+                    hedge = asyncio.ensure_future(self._synthesize(self.fallback, text, hedge_stream, rate))
+                if elapsed >= TTS_PRIMARY_TIMEOUT:
+                    timed_out = f"no audio after {TTS_PRIMARY_TIMEOUT:g}s"
+                    primary.cancel()
+                    break
+                await asyncio.wait({primary}, timeout=_POLL_INTERVAL)
+
+            # Committed: the primary must keep producing audio until it is done
+            last_size = stream.size
+            last_progress = time.monotonic()
+            while not primary.done() and timed_out is None:
+                await asyncio.wait({primary}, timeout=_POLL_INTERVAL)
+                if stream.size != last_size:
+                    last_size = stream.size
+                    last_progress = time.monotonic()
+                elif time.monotonic() - last_progress >= TTS_STALL_TIMEOUT:
+                    timed_out = f"stalled for {TTS_STALL_TIMEOUT:g}s mid-stream"
+                    primary.cancel()
+
+            try:
+                await primary
+            except asyncio.CancelledError:
+                if timed_out is None:
+                    raise  # We were cancelled ourselves
+                error = asyncio.TimeoutError(timed_out)
+            except Exception as e:
+                error = e
+            else:
+                self.breaker.record_success(first_audio or time.monotonic() - started)
+                stream.finish()
+                return stream, self.backend.duration(stream.data())
+
+            self.breaker.record_failure(type(error).__name__)
+            if stream.size > 0 or self.fallback is None:
+                # Audio already sent to the overlay cannot be swapped out
+                stream.finish(error)
+                playback.ack(stream.id)
+                raise error
+
+            LOGGER.warning(f"TTS backend {self.backend.name} failed ({error!r}), using {self.fallback.voice}")
+            self._counters["failed_over"] += 1
+            failed_over = True
+            if hedge is None:
+                hedge_stream = utterances.create(text, self.fallback.mimetype)
+                hedge = asyncio.ensure_future(self._synthesize(self.fallback, text, hedge_stream, rate))
+            playback.replace(stream, hedge_stream)
+            stream.finish(error)
+            try:
+                await hedge
+            except BaseException as e:
+                hedge_stream.finish(e)
+                playback.ack(hedge_stream.id)
+                raise
+            hedge_stream.finish()
+            return hedge_stream, self.fallback.duration(hedge_stream.data())
+        except asyncio.CancelledError:
+            # If this was the half-open probe, the breaker must not wait for it forever
+            self.breaker.record_cancelled()
+            raise
+        finally:
+            primary.cancel()  # No-op once it has finished
+            if hedge is not None and not failed_over:
+                hedge.cancel()  # The primary came through after all
+
+    async def _synthesize(self, backend, text: str, stream, rate: float = 1.0) -> None:
+        """Write the audio for `text` into `stream`; raises if a segment fails."""
+        segments = (split_sentences(text, TTS_MIN_SEGMENT_LENGTH) if backend.segmented else None) or [text]
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(self._synthesize_segment(backend, segment, stream if i == 0 else None, rate))
+            for i, segment in enumerate(segments)
+        ]
+        try:
+            for task in tasks:
+                audio = await task
+                if audio:
+                    stream.write(audio)
+        finally:
+            for task in tasks:
+                task.cancel()  # No-op for finished ones
+        LOGGER.debug(f"Synthesized {len(segments)} segments in {time.perf_counter() - started:.2f}s")
+
+    async def _synthesize_segment(self, backend, text: str, stream=None, rate: float = 1.0) -> bytes:
+        """Writes straight to `stream` if given, else returns the audio.
+
+        Segments already in the TTS cache are not synthesized again.
+        Failures are not retried here: the breaker and fallback handle them.
+        """
+        rate = rate if backend.variable_rate else 1.0
+        key = cache_key(text, backend.voice, backend.lang, backend.tld, rate)
+        cached = await asyncio.to_thread(tts_cache.get, key, backend.mimetype)
+        if cached is not None:
+            if stream is not None:
+                stream.write(cached)
+                return b""
+            return cached
+
+        chunks = []
+        semaphore = self._semaphores.get(backend.name)
+        if semaphore is None:
+            # Created on first use, inside the bot's event loop
+            semaphore = self._semaphores[backend.name] = asyncio.Semaphore(self._max_workers)
+        async with semaphore:
+            async for chunk in backend.stream(text, rate):
+                if stream is not None:
+                    stream.write(chunk)
+                chunks.append(chunk)
+
+        audio = b"".join(chunks)
+        await asyncio.to_thread(tts_cache.put, key, audio, backend.mimetype)
+        return b"" if stream is not None else audio
+
+
+tts_pipeline = TTSPipeline()
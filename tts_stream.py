@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from pubsub import Broadcaster
+
+LOGGER = logging.getLogger("TTSStream")
+
+# Constants
+MAX_TRACKED_UTTERANCES = 20  # Finished streams kept around for late/replayed requests
+STREAM_STALL_TIMEOUT = 30.0  # Seconds a reader waits for the next chunk before giving up
+ACK_TIMEOUT = 30.0  # Seconds to wait for the overlay's ack while a clip's length is unknown
+ACK_GRACE = 2.0  # Added to a known clip length before giving up on the ack
+
+
+class AudioStream:
+    """Audio bytes for one utterance that can be read while still being written.
+
+    The synthesis thread calls write() as chunks arrive from the TTS backend
+    and finish() at the end; any number of HTTP readers iterate the chunks
+    concurrently, blocking until more data is available.
+    """
+
+    def __init__(self, utterance_id: str, text: str, mimetype: str = "audio/mpeg"):
+        self.id = utterance_id
+        self.text = text
+        self.mimetype = mimetype
+        self.error = None
+        self._chunks = []
+        self._size = 0
+        self._done = False
+        self._cond = threading.Condition()
+
+    @property
+    def url(self) -> str:
+        return f"/api/tts/stream/{self.id}"
+
+    @property
+    def done(self) -> bool:
+        with self._cond:
+            return self._done
+
+    @property
+    def size(self) -> int:
+        with self._cond:
+            return self._size
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        with self._cond:
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: Exception | None = None) -> None:
+        with self._cond:
+            self.error = error
+            self._done = True
+            self._cond.notify_all()
+
+    def data(self) -> bytes:
+        """Everything written so far."""
+        with self._cond:
+            return b"".join(self._chunks)
+
+    def iter_chunks(self, timeout: float = STREAM_STALL_TIMEOUT):
+        """Yield chunks as they are written until the stream is finished."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._chunks) and not self._done:
+                    if not self._cond.wait(timeout):
+                        return  # Backend stalled; end the response
+                pending = self._chunks[index:]
+                index += len(pending)
+                finished = self._done
+            if pending:
+                yield b"".join(pending)
+            elif finished:
+                return
+
+
+class UtteranceRegistry:
+    """Tracks the most recent utterance streams by id.
+
+    Pinned streams (queued or playing, see PlaybackQueue) are never
+    evicted, so the overlay can always fetch them.
+    """
+
+    def __init__(self, max_tracked: int = MAX_TRACKED_UTTERANCES):
+        self._max_tracked = max_tracked
+        self._streams = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    def create(self, text: str, mimetype: str = "audio/mpeg") -> AudioStream:
+        stream = AudioStream(uuid.uuid4().hex[:12], text, mimetype)
+        with self._lock:
+            self._streams[stream.id] = stream
+            self._evict()
+        return stream
+
+    def pin(self, stream: AudioStream) -> None:
+        with self._lock:
+            self._pinned.add(stream.id)
+            self._streams.setdefault(stream.id, stream)
+
+    def unpin(self, stream: AudioStream) -> None:
+        with self._lock:
+            self._pinned.discard(stream.id)
+            self._evict()
+
+    def get(self, utterance_id: str) -> AudioStream | None:
+        with self._lock:
+            return self._streams.get(utterance_id)
+
+    def latest(self) -> AudioStream | None:
+        with self._lock:
+            return next(reversed(self._streams.values()), None)
+
+    def _evict(self) -> None:
+        """Drop the oldest unpinned streams beyond `max_tracked` (lock held)."""
+        excess = len(self._streams) - self._max_tracked
+        for utterance_id in list(self._streams):
+            if excess <= 0:
+                break
+            if utterance_id not in self._pinned:
+                del self._streams[utterance_id]
+                excess -= 1
+
+
+class PlaybackQueue:
+    """Plays utterances one at a time, in order, across all TTS overlays.
+
+    enqueue() adds a clip and announces it with an "utterance" event as
+    soon as nothing else is playing. The overlay acks when playback ends
+    and the next clip is announced right away. If no ack arrives (no
+    overlay open, or it was closed mid-clip), the queue moves on after the
+    clip's length plus a grace period, or ACK_TIMEOUT if the length is not
+    known yet.
+    """
+
+    def __init__(
+        self,
+        events: Broadcaster,
+        registry: UtteranceRegistry | None = None,
+        ack_timeout: float = ACK_TIMEOUT,
+        grace: float = ACK_GRACE,
+    ):
+        self._events = events
+        self._registry = registry  # Queued and playing clips are pinned in it
+        self._ack_timeout = ack_timeout
+        self._grace = grace
+        self._pending = deque()
+        self._durations = {}  # Clip lengths reported while still queued, by id
+        self._current = None
+        self._started_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, stream: AudioStream) -> None:
+        if self._registry is not None:
+            self._registry.pin(stream)
+        with self._lock:
+            self._pending.append(stream)
+            started = self._advance() if self._current is None else None
+        self._announce(started)
+
+    def ack(self, utterance_id: str) -> bool:
+        """Playback of `utterance_id` ended; start the next clip. False if it
+        isn't the current clip (e.g. a second overlay acking late)."""
+        with self._lock:
+            if self._current is None or self._current.id != utterance_id:
+                return False
+            started = self._advance()
+        self._announce(started)
+        return True
+
+    def replace(self, old: AudioStream, new: AudioStream) -> None:
+        """Put `new` in `old`'s place in the queue (e.g. a fallback voice
+        for a clip whose synthesis failed), or at the end if `old` is gone."""
+        started = None
+        if self._registry is not None:
+            self._registry.pin(new)
+        with self._lock:
+            if self._current is old:
+                self._pending.appendleft(new)
+                started = self._advance()
+            elif old in self._pending:
+                self._pending[self._pending.index(old)] = new
+                self._durations.pop(old.id, None)
+                self._release(old)
+            else:
+                self._pending.append(new)
+                started = self._advance() if self._current is None else None
+        self._announce(started)
+
+    def set_duration(self, utterance_id: str, seconds: float) -> None:
+        """Tighten the ack timeout once the clip's length is known.
+
+        For a clip that is still queued, the length is kept until it starts.
+        """
+        with self._lock:
+            if self._current is None or self._current.id != utterance_id:
+                if any(stream.id == utterance_id for stream in self._pending):
+                    self._durations[utterance_id] = seconds
+                return
+            elapsed = time.monotonic() - self._started_at
+            self._start_timer(utterance_id, max(0.0, seconds + self._grace - elapsed))
+
+    def current(self) -> AudioStream | None:
+        with self._lock:
+            return self._current
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _advance(self) -> AudioStream | None:
+        """Make the next pending clip current (lock held)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._current is not None:
+            self._release(self._current)
+        self._current = self._pending.popleft() if self._pending else None
+        if self._current is None:
+            return None
+        self._started_at = time.monotonic()
+        duration = self._durations.pop(self._current.id, None)
+        timeout = duration + self._grace if duration is not None else self._ack_timeout
+        self._start_timer(self._current.id, timeout)
+        return self._current
+
+    def _release(self, stream: AudioStream) -> None:
+        if self._registry is not None:
+            self._registry.unpin(stream)
+
+    def _start_timer(self, utterance_id: str, timeout: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(timeout, self._expire, args=(utterance_id,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self, utterance_id: str) -> None:
+        with self._lock:
+            if self._current is None or self._current.id != utterance_id:
+                return
+            LOGGER.info(f"No playback ack for utterance {utterance_id}, moving on")
+            started = self._advance()
+        self._announce(started)
+
+    def _announce(self, stream: AudioStream | None) -> None:
+        if stream is not None:
+            self._events.publish("utterance", {"id": stream.id, "url": stream.url}, stream.id)
+
+
+utterances = UtteranceRegistry()
+# "utterance" events tell the TTS overlay which clip to play next
+tts_events = Broadcaster()
+playback = PlaybackQueue(tts_events, utterances)
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+try:
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+    from googleapiclient.errors import HttpError
+except ImportError:
+    build = None
+
+load_dotenv()
+
+LOGGER = logging.getLogger("YouTubeRelay")
+
+# Configuration
+YOUTUBE_LIVE_CHAT_ID = os.environ.get("YOUTUBE_LIVE_CHAT_ID")
+YOUTUBE_TOKEN_FILE = "youtube_token.pickle"
+YOUTUBE_DAILY_QUOTA = int(os.environ.get("YOUTUBE_DAILY_QUOTA", "10000"))  # API units per day for the project
+YOUTUBE_QUOTA_HOURS = float(os.environ.get("YOUTUBE_QUOTA_HOURS", "6"))  # Streaming hours the daily quota should last
+YOUTUBE_RELAY_BURST = int(os.environ.get("YOUTUBE_RELAY_BURST", "5"))  # Messages that can go out back to back
+YOUTUBE_RELAY_INTERVAL = float(os.environ.get("YOUTUBE_RELAY_INTERVAL", "2"))  # Minimum seconds between messages
+YOUTUBE_RELAY_QUEUE_MAX = int(os.environ.get("YOUTUBE_RELAY_QUEUE_MAX", "50"))  # Queued lines; the oldest is dropped beyond this
+
+# Constants
+INSERT_COST = 50  # Quota units per liveChatMessages.insert
+MAX_CHAT_MESSAGE_LENGTH = 200  # YouTube rejects longer live chat messages
+COALESCE_SEPARATOR = " | "
+QUOTA_WINDOW = 24 * 3600.0  # Seconds the daily quota covers
+QUOTA_EXCEEDED_BACKOFF = 3600.0  # Seconds to stop sending after YouTube reports the quota is used up
+API_URL = "https://www.googleapis.com/youtube/v3/liveChat/messages"
+
+
+class QuotaExceeded(Exception):
+    """YouTube refused a message because the project's API quota is used up."""
+
+
+class YouTubeRelay:
+    """Sends relayed chat lines to YouTube live chat from one long-lived worker.
+
+    send() only queues the line. run() holds one authorized API client
+    (built once, refreshed when the token expires) and makes every blocking
+    call on its own single worker thread, never on the bot's event loop.
+
+    Sending is paced by a token bucket sized so YOUTUBE_DAILY_QUOTA lasts
+    YOUTUBE_QUOTA_HOURS, with a hard stop at the daily quota. Lines that
+    pile up meanwhile are joined into one message, up to YouTube's length
+    limit, so a busy chat costs fewer API calls.
+    """
+
+    def __init__(
+        self,
+        live_chat_id: str | None = YOUTUBE_LIVE_CHAT_ID,
+        token_file: str = YOUTUBE_TOKEN_FILE,
+        daily_quota: int = YOUTUBE_DAILY_QUOTA,
+        quota_hours: float = YOUTUBE_QUOTA_HOURS,
+        burst: int = YOUTUBE_RELAY_BURST,
+        interval: float = YOUTUBE_RELAY_INTERVAL,
+        max_queue: int = YOUTUBE_RELAY_QUEUE_MAX,
+    ):
+        self._live_chat_id = live_chat_id
+        self._token_file = token_file
+        self._daily_quota = daily_quota
+        self._burst = burst
+        self._interval = interval
+        self._refill_rate = daily_quota / INSERT_COST / (quota_hours * 3600)  # Messages per second
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._last_sent = 0.0
+        self._paused_until = 0.0
+        self._sent_times = deque()  # When each message in the quota window went out
+        self._queue = deque(maxlen=max_queue)
+        self._wakeup = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="youtube-relay")
+        self._creds = None
+        self._youtube = None
+        self._session = None
+        self._counters = {"queued": 0, "sent": 0, "lines_sent": 0, "coalesced": 0, "dropped": 0, "failed": 0}
+
+    def send(self, message: str) -> None:
+        """Queue a line for YouTube chat. Call from the bot's event loop."""
+        if self._wakeup is None:
+            LOGGER.debug("YouTube relay not running, skipping message")
+            return
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self._counters["dropped"] += 1  # The deque drops the oldest line
+            self._queue.append(message)
+            self._counters["queued"] += 1
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Drain the queue forever."""
+        if not self._live_chat_id:
+            LOGGER.info("YOUTUBE_LIVE_CHAT_ID not set. YouTube relay disabled.")
+            return
+        has_token = build is not None and os.path.exists(self._token_file)
+        if not has_token and not os.environ.get("YOUTUBE_ACCESS_TOKEN"):
+            LOGGER.info(f"No {self._token_file} or YOUTUBE_ACCESS_TOKEN. YouTube relay disabled.")
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.pending():
+                # Lines that arrive while we wait are sent together
+                while (wait := self._time_until_send()) > 0:
+                    await asyncio.sleep(wait)
+                message, lines = self._next_message()
+                if not message:
+                    break
+                try:
+                    await loop.run_in_executor(self._executor, self._send_blocking, message)
+                except QuotaExceeded as e:
+                    LOGGER.warning(f"YouTube quota exceeded, pausing relay for {QUOTA_EXCEEDED_BACKOFF:g}s: {e}")
+                    self._paused_until = time.monotonic() + QUOTA_EXCEEDED_BACKOFF
+                    self._count("failed", lines)
+                    continue
+                except Exception as e:
+                    LOGGER.error(f"Error sending message to YouTube chat: {e}")
+                    self._count("failed", lines)
+                    continue
+                LOGGER.info(f"Sent message to YouTube chat: {message}")
+                self._record_send()
+                self._count("sent", 1)
+                self._count("lines_sent", lines)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._counters,
+                pending=len(self._queue),
+                quota_used=len(self._sent_times) * INSERT_COST,
+                daily_quota=self._daily_quota,
+                tokens=round(self._tokens, 2),
+                paused_for=max(0.0, self._paused_until - time.monotonic()),
+            )
+
+    def _count(self, counter: str, amount: int) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _time_until_send(self) -> float:
+        """Seconds until the rate limits allow the next attempt (0: go now)."""
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._refill_rate)
+        self._refilled_at = now
+        while self._sent_times and now - self._sent_times[0] >= QUOTA_WINDOW:
+            self._sent_times.popleft()
+
+        wait = max(self._paused_until - now, self._last_sent + self._interval - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self._refill_rate)
+        if self._sent_times and (len(self._sent_times) + 1) * INSERT_COST > self._daily_quota:
+            wait = max(wait, self._sent_times[0] + QUOTA_WINDOW - now)
+        if wait > 0:
+            return wait
+        self._last_sent = now  # Failed attempts are spaced out too
+        return 0.0
+
+    def _record_send(self) -> None:
+        """Charge a successful insert to the token bucket and the daily quota."""
+        with self._lock:
+            self._tokens -= 1
+            self._sent_times.append(time.monotonic())
+
+    def _next_message(self) -> tuple[str, int]:
+        """Join as many queued lines as fit in one chat message."""
+        with self._lock:
+            if not self._queue:
+                return "", 0
+            lines = [self._queue.popleft()]
+            length = len(lines[0])
+            while self._queue and length + len(COALESCE_SEPARATOR) + len(self._queue[0]) <= MAX_CHAT_MESSAGE_LENGTH:
+                lines.append(self._queue.popleft())
+                length += len(COALESCE_SEPARATOR) + len(lines[-1])
+            self._counters["coalesced"] += len(lines) - 1
+        message = COALESCE_SEPARATOR.join(lines)
+        if len(message) > MAX_CHAT_MESSAGE_LENGTH:
+            message = message[:MAX_CHAT_MESSAGE_LENGTH - 1] + "…"
+        return message, len(lines)
+
+    def _send_blocking(self, message: str) -> None:
+        """Runs on the relay's worker thread."""
+        youtube = self._client() if build is not None else None
+        if youtube is None:
+            self._send_http(message)
+            return
+        try:
+            youtube.liveChatMessages().insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "liveChatId": self._live_chat_id,
+                        "type": "textMessageEvent",
+                        "textMessageDetails": {"messageText": message},
+                    }
+                },
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == 403 and b"quotaExceeded" in (e.content or b""):
+                raise QuotaExceeded(str(e)) from e
+            if not os.environ.get("YOUTUBE_ACCESS_TOKEN"):
+                raise
+            LOGGER.warning(f"Error sending YouTube message via API: {e}, trying HTTP")
+            self._send_http(message)
+
+    def _client(self):
+        """The authorized YouTube API client, or None without a usable token."""
+        if self._creds is None:
+            if not os.path.exists(self._token_file):
+                LOGGER.warning("YouTube OAuth token not available. Please authenticate first.")
+                return None
+            with open(self._token_file, "rb") as token:
+                self._creds = pickle.load(token)
+        if not self._creds.valid:
+            if not (self._creds.expired and self._creds.refresh_token):
+                LOGGER.warning("YouTube OAuth token not available or expired. Please authenticate first.")
+                self._creds = None  # Read the file again next time, in case it was renewed
+                return None
+            self._creds.refresh(Request())
+            with open(self._token_file, "wb") as token:
+                pickle.dump(self._creds, token)
+        if self._youtube is None:
+            self._youtube = build("youtube", "v3", credentials=self._creds, cache_discovery=False)
+        return self._youtube
+
+    def _send_http(self, message: str) -> None:
+        """Without google-api-python-client: plain HTTP with YOUTUBE_ACCESS_TOKEN."""
+        access_token = os.environ.get("YOUTUBE_ACCESS_TOKEN")
+        if not access_token:
+            raise RuntimeError("no YouTube OAuth token or YOUTUBE_ACCESS_TOKEN configured")
+        if self._session is None:
+            self._session = requests.Session()  # Keeps the HTTPS connection open between messages
+        response = self._session.post(
+            API_URL,
+            params={"part": "snippet"},
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={
+                "snippet": {
+                    "liveChatId": self._live_chat_id,
+                    "type": "textMessageEvent",
+                    "textMessageDetails": {"messageText": message},
+                }
+            },
+            timeout=10,
+        )
+        if response.status_code == 403 and "quotaExceeded" in response.text:
+            raise QuotaExceeded(response.text)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+
+
+youtube_relay = YouTubeRelay()